@@ -1,13 +1,30 @@
+import atexit
 import json
+from contextlib import nullcontext
+from datetime import datetime, timezone
 from bson import json_util
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, request, jsonify, make_response, g
 from flask_cors import CORS
-from pymongo import MongoClient, ReturnDocument
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from pymongo.write_concern import WriteConcern
 from pathlib import Path
 import os
-import firebase_admin
-from firebase_admin import credentials, auth
-from functools import wraps
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from auth_decorator import firebase_token_required
+from clients import LazyCollection
+from menu_cache import MenuCache
+from metrics import finish_request, render_metrics, start_request
+from indexes import api_index_specs, ensure_indexes
+from queries import (
+    bootstrap_body, daily_menu, failed_upserts, food_rating_update, history_entries, leaderboard_params, leaderboard_update, history_params, history_query, history_updates,
+    local_day, macro_deltas, macro_update, meal_deltas, menu_params, menu_pipeline, menu_today, rating_deltas, rating_upsert,
+    plan_params, search_params, search_results, shape_menu, MENU_ITEM_FIELDS, PLANNER_FIELDS, SEARCH_PROJECTION,
+)
+from rating_buffer import RatingWriteBehind, pending_marker
+from search_index import SearchIndex
 
 
 
@@ -18,44 +35,51 @@ env_path = Path(__file__).parent.parent / 'secret.env'
 
 app = Flask(__name__)
 
-cred = credentials.Certificate(os.environ.get("cred"))
-firebase_admin.initialize_app(cred)
-
 # Allowed origins (both localhost and 127.0.0.1)
 allowed_origins = ["http://localhost:5002", "http://127.0.0.1:5002"]
 
 # Configure CORS
 CORS(app, resources={r"/*": {"origins": allowed_origins}}, supports_credentials=True)
 
-# MongoDB setup
-client = MongoClient(os.environ.get("MONGOURI"))
-db = client[os.environ.get("MONGODB_NAME")]
-collection = db[os.environ.get("MONGO_COLLECTION_NAME")]
-collectionToday = db[os.environ.get("TODAYSFOOD")]
-collectionMisc = db[os.environ.get("MISC")]
-
-# Firebase authentication decorator
-def firebase_token_required(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        id_token = None
-        # Get the token from the Authorization header
-        if 'Authorization' in request.headers:
-            auth_header = request.headers['Authorization']
-            parts = auth_header.split()
-            if len(parts) == 2 and parts[0] == 'Bearer':
-                id_token = parts[1]
-        if not id_token:
-            return jsonify({'message': 'Unauthorized'}), 401
-        try:
-            # Verify the token with Firebase
-            decoded_token = auth.verify_id_token(id_token)
-            request.uid = decoded_token['uid']
-            return f(*args, **kwargs)
-        except Exception as e:
-            print(f"Authentication error: {e}")
-            return jsonify({'message': 'Unauthorized'}), 401
-    return decorated_function
+# MongoDB setup (the client connects on first use, see clients.py)
+collection = LazyCollection("MONGO_COLLECTION_NAME")
+collectionToday = LazyCollection("TODAYSFOOD")
+collectionMisc = LazyCollection("MISC")
+collectionMenuMeta = LazyCollection("MENU_META", "menuMeta")
+collectionRatings = LazyCollection("RATINGS", "ratings")
+collectionHistory = LazyCollection("MACRO_HISTORY", "macroHistory")
+collectionLeaderboard = LazyCollection("LEADERBOARD", "leaderboard")
+collectionDailyMenus = LazyCollection("DAILY_MENUS", "dailyMenus")
+
+def bootstrap_indexes():
+    """Make sure the title/uid lookups used by every endpoint are indexed."""
+    created_indexes = ensure_indexes(
+        api_index_specs(
+            collection, collectionToday, collectionMisc, collectionRatings, collectionHistory, collectionLeaderboard
+        )
+    )
+    print(f"Created indexes: {created_indexes or 'none'}")
+
+# Long-running servers check indexes at startup; Lambda cold starts skip it unless ENSURE_INDEXES=1
+if os.environ.get("ENSURE_INDEXES", "0" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else "1") == "1":
+    try:
+        bootstrap_indexes()
+    except PyMongoError as e:
+        # Serve anyway; requests work (unindexed) once Mongo is reachable and the next start retries
+        print(f"Could not ensure indexes at startup: {e}")
+
+@app.before_request
+def start_request_timer():
+    """Time the request and tag it with a request id (taken from X-Request-Id when sent)."""
+    g.request_id = start_request(request.headers.get("X-Request-Id"))
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Record the request's latency and return its request id."""
+    response.headers["X-Request-Id"] = g.get("request_id", "")
+    finish_request(request.url_rule.rule if request.url_rule else "unmatched", request.method, response.status_code)
+    return response
 
 
 @app.after_request
@@ -108,35 +132,193 @@ def handle_exception(e):
         response.headers['Access-Control-Allow-Origin'] = 'null'
     return response, 500
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Latency metrics in the Prometheus text format."""
+    response = make_response(render_metrics(), 200)
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+def load_current_food_items(date=None, **params):
+    """Build the menu for ``date`` (default today), optionally filtered, projected and paginated.
+
+    Dates the scraper precomputed a dailyMenus document for are served from it
+    (see queries.daily_menu); without one, today comes from todaysFood (see
+    queries.menu_pipeline) and other dates raise LookupError.
+    """
+    today = menu_today()
+    date = date or today
+    daily = collectionDailyMenus.find_one({"_id": date}, {"items": 1})
+    if daily is not None:
+        ratings = {}
+        if {"rating", "rating_count"} & set(params.get("fields", MENU_ITEM_FIELDS)):
+            titles = [item["title"] for item in daily["items"]]
+            query = {"title": {"$in": titles}}
+            ratings = {doc["title"]: doc for doc in collection.find(query, {"_id": 0, "title": 1, "rating": 1, "rating_count": 1})}
+        return shape_menu(daily_menu(daily["items"], ratings, **params), **params)
+    if date != today:
+        raise LookupError(f"No menu for {date}")
+
+    pipeline = menu_pipeline(collection.name, **params)
+    items = list(collectionToday.aggregate(pipeline))
+    return shape_menu(items, **params)
+
+def load_menu_ratings(titles):
+    """Current ``{title: (rating, rating_count)}`` of the cached menus' items."""
+    projection = {"_id": 0, "title": 1, "rating": 1, "rating_count": 1}
+    return {
+        doc["title"]: (doc.get("rating"), doc.get("rating_count"))
+        for doc in collection.find({"title": {"$in": list(titles)}}, projection)
+    }
+
+# Serialized menu, rebuilt only when the scraper bumps the menu version; ratings are overlaid separately
+menu_cache = MenuCache(
+    collectionMenuMeta,
+    load_current_food_items,
+    load_ratings=load_menu_ratings,
+    poll_interval=float(os.environ.get("MENU_VERSION_POLL_SECONDS", 30)),
+)
+
 @app.route('/api/getCurrentFoodItems', methods=['GET'])
 @firebase_token_required
 def get_current_food_items():
-    """Retrieve current food items."""
+    """Retrieve current food items.
+
+    Optional query parameters: ``date`` (YYYY-MM-DD, default today), ``dining_hall``,
+    ``meal_period``, ``labels`` (any of), ``exclude_labels``, ``fields`` (comma-separated
+    subset of MENU_ITEM_FIELDS), and ``limit``/``cursor`` for pagination.
+    """
+    try:
+        params = menu_params(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
     try:
-        todaysFoodTitles = list(collectionToday.find({}, {"title": 1, "_id": 0}))
-        titleList = [item["title"] for item in todaysFoodTitles]
-        todaysFoodItems = list(collection.find({"title": {"$in": titleList}}))
-
-        formatted_items = [
-            {
-                "title": item.get("title"),
-                "dining_hall": item.get("dining_hall"),
-                "meal_period": item.get("meal_period"),
-                "portion_size": item.get("portion_size"),
-                "nutritional_info": item.get("nutritional_info"),
-                "table_caption": item.get("table_caption"),
-                "rating": item.get("rating"),
-                "rating_count": item.get("rating_count"),
-                "labels": item.get("labels"),
-                "ingredients": item.get("ingredients"),
-            }
-            for item in todaysFoodItems
-        ]
-        return jsonify(formatted_items), 200
+        etag, body = menu_cache.get(**params)
+        if request.if_none_match.contains(etag):
+            response = make_response("", 304)
+        else:
+            response = make_response(body, 200)
+            response.mimetype = "application/json"
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except LookupError as e:
+        return jsonify({"message": str(e)}), 404
     except Exception as e:
         print(f"Error in getCurrentFoodItems: {e}")
         return jsonify({"message": "Failed to retrieve food items"}), 500
 
+# Search index over the whole catalog, refreshed when the scraper adds or changes catalog items
+search_index = SearchIndex()
+search_refresh_lock = threading.Lock()
+
+def refresh_search_index():
+    """Re-index catalog items that are new or changed (by fingerprint) since the last refresh."""
+    version = menu_cache.catalog_version()
+    if search_index.version == version:
+        return
+    with search_refresh_lock:
+        if search_index.version == version:
+            return
+        fingerprints = {
+            doc["title"]: doc.get("fingerprint")
+            for doc in collection.find({}, {"title": 1, "fingerprint": 1, "_id": 0})
+            if "title" in doc
+        }
+        changed, removed = search_index.stale(fingerprints)
+        query = {"title": {"$in": changed}} if len(search_index) else {}
+        items = list(collection.find(query, SEARCH_PROJECTION)) if changed else []
+        search_index.update(items, removed, version)
+        print(f"Search index refreshed: {len(items)} items re-indexed, {len(removed)} removed.")
+
+@app.route('/api/searchFood', methods=['GET'])
+@firebase_token_required
+def search_food():
+    """Search the food catalog by title, ingredients, station and labels.
+
+    Query parameters: ``q`` and optional ``limit``. Matches word prefixes and
+    single-character typos; every word must match and the best matches come first.
+    """
+    try:
+        params = search_params(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        refresh_search_index()
+        return jsonify({"results": search_results(search_index.search(**params))}), 200
+    except Exception as e:
+        print(f"Error in searchFood: {e}")
+        return jsonify({"message": "Failed to search food items"}), 500
+
+# Nutrient matrix of the current menu for /api/planMeal, rebuilt when the menu version moves
+planner = None
+planner_lock = threading.Lock()
+
+def current_planner():
+    """Return the meal planner for the current menu version and date."""
+    global planner
+    # Ratings don't affect plans, so only a new scrape or a new day rebuilds the matrix
+    version = (menu_cache.current_version(), menu_today())
+    with planner_lock:
+        if planner is None or planner.version != version:
+            # numpy is only imported once someone plans a meal
+            from meal_planner import MealPlanner
+            planner = MealPlanner(load_current_food_items(fields=PLANNER_FIELDS), version)
+        return planner
+
+@app.route('/api/planMeal', methods=['POST'])
+@firebase_token_required
+def plan_meal():
+    """Suggest combinations of today's menu items that best meet macro targets.
+
+    Body: ``targets`` (any of calories, protein, carbs, fat), optional ``labels``
+    every item must have (e.g. vegan, gluten), ``dining_hall``, ``meal_period``,
+    ``max_items``, ``max_servings`` and ``results``.
+    """
+    try:
+        params = plan_params(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        plans = current_planner().plan(**params)
+        return jsonify({"plans": plans}), 200
+    except Exception as e:
+        print(f"Error in planMeal: {e}")
+        return jsonify({"message": "Failed to plan meal"}), 500
+
+def apply_macro_deltas(uid, deltas):
+    """Atomically add deltas to a user's macros, clamping each at zero.
+
+    Returns the updated macros, or None if the user does not exist.
+    """
+    updated_user = collectionMisc.find_one_and_update(
+        {"uid": uid},
+        macro_update(deltas),
+        projection={"macros": 1, "_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    return updated_user["macros"] if updated_user else None
+
+def record_history(uid, items, deltas):
+    """Append logged items to the user's macro history and add them to its day and week rollups.
+
+    Runs after the macros are committed, so a failure is logged rather than
+    failing the request (which a client retry would count twice).
+    """
+    now = datetime.now(timezone.utc)
+    operations = history_updates(uid, local_day(now), history_entries(items, now), deltas)
+    try:
+        try:
+            collectionHistory.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # A concurrent first log of the day or week created the document; re-apply the upserts that lost
+            collectionHistory.bulk_write(failed_upserts(e, operations), ordered=False)
+    except Exception as e:
+        print(f"Error recording macro history for {uid}: {e}")
+
 @app.route('/api/updateMacros', methods=['POST'])
 @firebase_token_required
 def update_macros():
@@ -152,35 +334,11 @@ def update_macros():
         if not uid or not serving_size or not food_item:
             return jsonify({"message": "Missing required fields"}), 400
 
-        # Parse nutritional information safely
-        nutritional_info = food_item.get('nutritional_info')
-        if isinstance(nutritional_info, str):
-            nutritional_info = json.loads(nutritional_info)
-
-        def safe_float(value):
-            """Convert a value to float, defaulting to 0 if it fails."""
-            try:
-                return float(value.replace("less than", "0").split()[0])  # Handle strings like "less than 1 gram"
-            except (ValueError, AttributeError):
-                return 0.0
-
-        user = collectionMisc.find_one({"uid": uid})
-        if user:
-            macros = user.get("macros", {"calories": 0, "protein": 0, "carbs": 0, "fat": 0})
-            macros["calories"] += round(safe_float(nutritional_info.get("Calories", "0")) * serving_size)
-            macros["protein"] += round(safe_float(nutritional_info.get("Protein (g)", "0")) * serving_size)
-            macros["carbs"] += round(safe_float(nutritional_info.get("Total Carbohydrates (g)", "0")) * serving_size)
-            macros["fat"] += round(safe_float(nutritional_info.get("Total Fat (g)", "0")) * serving_size)
-
-            # Ensure no negative macros
-            macros = {k: max(0, v) for k, v in macros.items()}
-
-            updated_user = collectionMisc.find_one_and_update(
-                {"uid": uid},
-                {"$set": {"macros": macros}},
-                return_document=ReturnDocument.AFTER
-            )
-            print(f"Updated user macros: {updated_user}")
+        deltas = macro_deltas(food_item, serving_size)
+        macros = apply_macro_deltas(uid, deltas)
+        if macros is not None:
+            record_history(uid, [{"food_item": food_item, "serving_size": serving_size}], deltas)
+            print(f"Updated user macros: {macros}")
             return jsonify({"message": "Macros updated successfully", "macros": macros}), 200
         else:
             return jsonify({"message": "User does not exist"}), 404
@@ -188,7 +346,97 @@ def update_macros():
         print(f"Error in update_macros: {e}")
         return jsonify({"message": "Failed to update macros"}), 500
 
+@app.route('/api/logMeal', methods=['POST'])
+@firebase_token_required
+def log_meal():
+    """Add the macros of several food items to the user in a single write."""
+    try:
+        data = request.json
+        print("Received data:", data)
+
+        uid = data.get('uid')
+        items = data.get('items')
+
+        if not uid or not items:
+            return jsonify({"message": "Missing required fields"}), 400
+
+        try:
+            deltas = meal_deltas(items)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        macros = apply_macro_deltas(uid, deltas)
+        if macros is not None:
+            record_history(uid, items, deltas)
+            print(f"Updated user macros: {macros}")
+            return jsonify({"message": "Meal logged successfully", "macros": macros}), 200
+        else:
+            return jsonify({"message": "User does not exist"}), 404
+    except Exception as e:
+        print(f"Error in log_meal: {e}")
+        return jsonify({"message": "Failed to log meal"}), 500
+
+
+@app.route('/api/getMacroHistory', methods=['GET'])
+@firebase_token_required
+def get_macro_history():
+    """Retrieve the user's daily or weekly macro totals over a date range.
+
+    Query parameters: ``period`` (day or week), ``start`` and ``end`` (YYYY-MM-DD,
+    default the last 7 days) and ``entries=true`` to include each day's logged items.
+    """
+    try:
+        params = history_params(request.args, local_day(datetime.now(timezone.utc)))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        query, projection = history_query(request.uid, **params)
+        history = list(collectionHistory.find(query, projection).sort("start", 1))
+        return jsonify({"period": params["period"], "history": history}), 200
+    except Exception as e:
+        print(f"Error in getMacroHistory: {e}")
+        return jsonify({"message": "Failed to fetch macro history"}), 500
 
+# Runs the independent reads of /api/bootstrap alongside each other
+bootstrap_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("BOOTSTRAP_WORKERS", 8)))
+
+def submit_in_context(fn, *args, **kwargs):
+    """Run ``fn`` on the bootstrap executor, keeping the request's metrics context."""
+    return bootstrap_executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def load_rated_titles(uid):
+    """Titles of the food items a user has rated."""
+    return [doc["title"] for doc in collectionRatings.find({"uid": uid}, {"title": 1, "_id": 0})]
+
+@app.route('/api/bootstrap', methods=['GET'])
+@firebase_token_required
+def bootstrap():
+    """Retrieve what the home page needs in one request.
+
+    Returns ``{"menu", "ratedFood", "macros"}``; takes the same query parameters as
+    getCurrentFoodItems. The menu and the user's ratings are read alongside the user document.
+    """
+    try:
+        params = menu_params(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        uid = request.uid  # Retrieved from the authentication decorator
+        menu = submit_in_context(menu_cache.get, **params)
+        rated_food = submit_in_context(load_rated_titles, uid)
+        user = collectionMisc.find_one({"uid": uid}, {"macros": 1, "_id": 0})
+        _, menu_body = menu.result()
+        response = make_response(bootstrap_body(menu_body, rated_food.result(), user), 200)
+        response.mimetype = "application/json"
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except LookupError as e:
+        return jsonify({"message": str(e)}), 404
+    except Exception as e:
+        print(f"Error in bootstrap: {e}")
+        return jsonify({"message": "Failed to load home page data"}), 500
 
 @app.route('/api/getUserRatedFood', methods=['GET'])
 @firebase_token_required
@@ -198,12 +446,7 @@ def get_user_rated_food():
         uid = request.uid  # Retrieved from the authentication decorator
         print(f"Fetching rated food for user UID: {uid}")
 
-        user = collectionMisc.find_one({"uid": uid})
-        if user:
-            rated_food = user.get("ratedFood", [])
-            return jsonify({"ratedFood": rated_food}), 200
-        else:
-            return jsonify({"ratedFood": []}), 200
+        return jsonify({"ratedFood": load_rated_titles(uid)}), 200
     except Exception as e:
         print(f"Error in getUserRatedFood: {e}")
         return jsonify({"message": "Failed to fetch user rated food"}), 500
@@ -220,7 +463,7 @@ def make_user():
         if existing_user:
             return jsonify({"message": "User already exists"}), 200
 
-        new_user = {"uid": uid, "ratedFood": [], "macros": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}}
+        new_user = {"uid": uid, "macros": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}}
         collectionMisc.insert_one(new_user)
         return jsonify({"message": "User created successfully"}), 201
     except Exception as e:
@@ -245,55 +488,118 @@ def get_user_macros():
         print(f"Error in getUserMacros: {e}")
         return jsonify({"message": "Failed to fetch user macros"}), 500
 
+def update_leaderboard(item):
+    """Refresh a rated item's leaderboard entry, without waiting for the server to acknowledge it.
+
+    build_leaderboard.py repairs any entry a lost write leaves behind.
+    """
+    try:
+        collectionLeaderboard.with_options(write_concern=WriteConcern(w=0)).update_one(
+            *leaderboard_update(item), upsert=True
+        )
+    except DuplicateKeyError:
+        # A newer rating of this item already refreshed the entry (only reported by acknowledged writes)
+        pass
+
+@app.route('/api/getLeaderboard', methods=['GET'])
+@firebase_token_required
+def get_leaderboard():
+    """Retrieve the top-rated items of a dining hall's meal period.
+
+    Query parameters: ``dining_hall``, ``meal_period`` and optional ``limit``. Items
+    are ranked by their Bayesian-adjusted average rating.
+    """
+    try:
+        params = leaderboard_params(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        query = {"dining_hall": params["dining_hall"], "meal_period": params["meal_period"]}
+        projection = {"_id": 0, "rating_version": 0}
+        leaderboard = list(collectionLeaderboard.find(query, projection).sort("score", -1).limit(params["limit"]))
+        return jsonify({"leaderboard": leaderboard}), 200
+    except Exception as e:
+        print(f"Error in getLeaderboard: {e}")
+        return jsonify({"message": "Failed to fetch leaderboard"}), 500
+
+def refresh_rated_items(titles):
+    """Refresh leaderboard entries and the cached menus' ratings after a write-behind rating flush."""
+    for item in collection.find({"title": {"$in": titles}}):
+        update_leaderboard(item)
+    menu_cache.refresh_ratings(force=True)
+
+# With RATING_WRITE_BEHIND=1 food rating aggregates are buffered and flushed in bulk
+# (at most RATING_FLUSH_SECONDS stale); user ratings are still written on every request
+rating_buffer = None
+if os.environ.get("RATING_WRITE_BEHIND") == "1":
+    rating_buffer = RatingWriteBehind(
+        collection,
+        collectionRatings,
+        on_flush=refresh_rated_items,
+        flush_interval=float(os.environ.get("RATING_FLUSH_SECONDS", 5)),
+        max_titles=int(os.environ.get("RATING_FLUSH_MAX_TITLES", 500)),
+    )
+    rating_buffer.start()
+    atexit.register(rating_buffer.close)
+
 @app.route('/api/rate', methods=['POST'])
 @firebase_token_required
 def update_rating():
-    """Update rating for a food item."""
+    """Update the caller's rating for a food item."""
     try:
         data = request.json
         print("Received data:", data)
 
         title = data.get('title')
         new_rating = data.get('rating')
-        uid = data.get('uid')
+        # Votes are keyed on the verified token's uid; a uid in the body is ignored
+        uid = request.uid
 
-        if not title or not new_rating or not uid:
+        if not title or not new_rating:
             return jsonify({"message": "Missing required fields"}), 400
 
-        user = collectionMisc.find_one({"uid": uid})
-        if user:
-            rated_food = user.get("ratedFood", [])
-
-            if title in rated_food:
-                # Update the existing rating
-                existing_rating = collection.find_one({"title": title})
-                if existing_rating:
-                    total_rating = existing_rating.get("rating", 0)
-                    rating_count = existing_rating.get("rating_count", 0)
-                    new_total_rating = total_rating + new_rating - (total_rating / rating_count)
-                    collection.find_one_and_update(
-                        {"title": title},
-                        {"$set": {"rating": new_total_rating}},
-                        return_document=ReturnDocument.AFTER,
-                    )
-            else:
-                # Add new rating
-                collection.find_one_and_update(
+        # One document per (uid, title); the previous value tells us how to adjust the aggregate
+        with rating_buffer.vote() if rating_buffer else nullcontext((None, None)) as (generation, add_vote):
+            previous = collectionRatings.find_one_and_update(
+                {"uid": uid, "title": title},
+                rating_upsert(new_rating, pending_marker(generation) if generation else None),
+                upsert=True,
+                return_document=ReturnDocument.BEFORE,
+            )
+
+            deltas = rating_deltas(previous, new_rating) if add_vote else None
+            if deltas is not None and rating_buffer.foreign(previous):
+                # Adding only a difference would hide the other generation's unwritten vote
+                deltas = None
+                updated_item = rating_buffer.settle(uid, title, previous, new_rating)
+            elif deltas is None:
+                updated_item = collection.find_one_and_update(
                     {"title": title},
-                    {"$inc": {"rating": new_rating, "rating_count": 1}},
-                    return_document=ReturnDocument.AFTER,
-                )
-                collectionMisc.find_one_and_update(
-                    {"uid": uid},
-                    {"$push": {"ratedFood": title}},
+                    food_rating_update(previous, new_rating),
                     return_document=ReturnDocument.AFTER,
                 )
-
-            updated_item = collection.find_one({"title": title})
-            send_item = json.loads(json_util.dumps(updated_item))
-            return jsonify(send_item), 200
+            else:
+                updated_item = collection.find_one({"title": title})
+            if updated_item is None:
+                if previous is None:
+                    collectionRatings.delete_one({"uid": uid, "title": title})
+                return jsonify({"message": "Food item does not exist"}), 404
+            if deltas is not None:
+                add_vote(title, *deltas)
+
+        if deltas is None:
+            update_leaderboard(updated_item)
         else:
-            return jsonify({"message": "User does not exist"}), 404
+            # Show the caller their vote before the next flush writes it
+            rating_delta, count_delta = rating_buffer.pending(title, updated_item.get("rating_batches", ()))
+            updated_item["rating"] = updated_item.get("rating", 0) + rating_delta
+            updated_item["rating_count"] = updated_item.get("rating_count", 0) + count_delta
+        # Other instances pick the new rating up within MENU_VERSION_POLL_SECONDS
+        menu_cache.update_rating(updated_item)
+
+        send_item = json.loads(json_util.dumps(updated_item))
+        return jsonify(send_item), 200
     except Exception as e:
         print(f"Error in update_rating: {e}")
         return jsonify({"message": "Failed to update rating"}), 500
@@ -0,0 +1,612 @@
+"""ASGI version of the API in app.py, for running under an ASGI server:
+
+    hypercorn asgi_app:app
+
+Routes and response shapes match app.py. Handlers are async, Mongo is reached
+through pymongo's AsyncMongoClient, and a blocking Firebase verification runs
+in a worker thread, so one process serves many requests while they wait on I/O.
+"""
+import asyncio
+import json
+from datetime import datetime, timezone
+import os
+from functools import wraps
+
+from bson import json_util
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from pymongo.write_concern import WriteConcern
+from quart import Quart, request, jsonify, make_response, g
+
+from auth_decorator import bearer_token, token_cache, verify_with_firebase
+from clients import LazyCollection, get_async_db
+from indexes import api_index_specs, ensure_indexes_async
+from menu_cache import AsyncMenuCache
+from metrics import finish_request, render_metrics, start_request
+from queries import (
+    bootstrap_body, daily_menu, failed_upserts, food_rating_update, history_entries, leaderboard_params, leaderboard_update, history_params, history_query, history_updates,
+    local_day, macro_deltas, macro_update, meal_deltas, menu_params, menu_pipeline, menu_today, rating_upsert,
+    plan_params, search_params, search_results, shape_menu, MENU_ITEM_FIELDS, PLANNER_FIELDS, SEARCH_PROJECTION,
+)
+from search_index import SearchIndex
+
+app = Quart(__name__)
+
+# Allowed origins (both localhost and 127.0.0.1)
+allowed_origins = ["http://localhost:5002", "http://127.0.0.1:5002"]
+
+# MongoDB setup (the async client connects on first use, see clients.py)
+collection = LazyCollection("MONGO_COLLECTION_NAME", database=get_async_db)
+collectionToday = LazyCollection("TODAYSFOOD", database=get_async_db)
+collectionMisc = LazyCollection("MISC", database=get_async_db)
+collectionMenuMeta = LazyCollection("MENU_META", "menuMeta", database=get_async_db)
+collectionRatings = LazyCollection("RATINGS", "ratings", database=get_async_db)
+collectionHistory = LazyCollection("MACRO_HISTORY", "macroHistory", database=get_async_db)
+collectionLeaderboard = LazyCollection("LEADERBOARD", "leaderboard", database=get_async_db)
+collectionDailyMenus = LazyCollection("DAILY_MENUS", "dailyMenus", database=get_async_db)
+
+
+@app.before_serving
+async def bootstrap_indexes():
+    """Make sure the title/uid lookups used by every endpoint are indexed."""
+    if os.environ.get("ENSURE_INDEXES", "1") != "1":
+        return
+    try:
+        created_indexes = await ensure_indexes_async(
+            api_index_specs(
+                collection, collectionToday, collectionMisc, collectionRatings, collectionHistory, collectionLeaderboard
+            )
+        )
+    except PyMongoError as e:
+        # Serve anyway; requests work (unindexed) once Mongo is reachable and the next start retries
+        print(f"Could not ensure indexes at startup: {e}")
+        return
+    print(f"Created indexes: {created_indexes or 'none'}")
+
+
+@app.before_request
+async def start_request_timer():
+    """Time the request and tag it with a request id (taken from X-Request-Id when sent)."""
+    g.request_id = start_request(request.headers.get("X-Request-Id"))
+
+
+@app.after_request
+async def record_request_metrics(response):
+    """Record the request's latency and return its request id."""
+    response.headers["X-Request-Id"] = g.get("request_id", "")
+    finish_request(request.url_rule.rule if request.url_rule else "unmatched", request.method, response.status_code)
+    return response
+
+
+@app.after_request
+async def add_cors_headers(response):
+    """Add CORS headers to all responses."""
+    origin = request.headers.get('Origin')
+    if origin in allowed_origins:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Vary'] = 'Origin'
+    else:
+        response.headers['Access-Control-Allow-Origin'] = '*'
+
+    response.headers.add("Access-Control-Allow-Headers", "Content-Type, Authorization")
+    response.headers.add("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+    return response
+
+
+@app.before_request
+async def handle_options():
+    """Handle preflight OPTIONS requests."""
+    if request.method == 'OPTIONS':
+        response = await make_response("")
+        response.headers['Access-Control-Allow-Origin'] = request.headers.get('Origin', '*')
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        response.headers['Access-Control-Max-Age'] = '86400'
+        return response
+
+
+@app.errorhandler(401)
+async def unauthorized(e):
+    """Handles unauthorized errors."""
+    response = jsonify({"message": "Unauthorized"})
+    origin = request.headers.get('Origin')
+    if origin in allowed_origins:
+        response.headers['Access-Control-Allow-Origin'] = origin
+    else:
+        response.headers['Access-Control-Allow-Origin'] = 'null'
+    return response, 401
+
+
+@app.errorhandler(Exception)
+async def handle_exception(e):
+    """Handles all exceptions."""
+    print(f"Error occurred: {e}")
+    response = jsonify({"message": "Internal server error"})
+    origin = request.headers.get('Origin')
+    if origin in allowed_origins:
+        response.headers['Access-Control-Allow-Origin'] = origin
+    else:
+        response.headers['Access-Control-Allow-Origin'] = 'null'
+    return response, 500
+
+
+# Firebase authentication decorator (async version of auth_decorator.firebase_token_required)
+def firebase_token_required(f):
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        # Get the token from the Authorization header
+        id_token = bearer_token(request.headers)
+        if not id_token:
+            return jsonify({'message': 'Unauthorized'}), 401
+        try:
+            # Cached tokens skip Firebase; a miss is verified off the event loop
+            decoded_token = token_cache.get(id_token)
+            if decoded_token is None:
+                decoded_token = await asyncio.to_thread(verify_with_firebase, id_token)
+            request.uid = decoded_token['uid']
+            return await f(*args, **kwargs)
+        except Exception as e:
+            print(f"Authentication error: {e}")
+            return jsonify({'message': 'Unauthorized'}), 401
+    return decorated_function
+
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """Latency metrics in the Prometheus text format."""
+    response = await make_response(render_metrics(), 200)
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+
+async def load_current_food_items(date=None, **params):
+    """Build the menu for ``date`` (default today), optionally filtered, projected and paginated.
+
+    Dates the scraper precomputed a dailyMenus document for are served from it
+    (see queries.daily_menu); without one, today comes from todaysFood (see
+    queries.menu_pipeline) and other dates raise LookupError.
+    """
+    today = menu_today()
+    date = date or today
+    daily = await collectionDailyMenus.find_one({"_id": date}, {"items": 1})
+    if daily is not None:
+        ratings = {}
+        if {"rating", "rating_count"} & set(params.get("fields", MENU_ITEM_FIELDS)):
+            titles = [item["title"] for item in daily["items"]]
+            query = {"title": {"$in": titles}}
+            docs = await collection.find(query, {"_id": 0, "title": 1, "rating": 1, "rating_count": 1}).to_list()
+            ratings = {doc["title"]: doc for doc in docs}
+        return shape_menu(daily_menu(daily["items"], ratings, **params), **params)
+    if date != today:
+        raise LookupError(f"No menu for {date}")
+
+    pipeline = menu_pipeline(collection.name, **params)
+    cursor = await collectionToday.aggregate(pipeline)
+    return shape_menu(await cursor.to_list(), **params)
+
+
+async def load_menu_ratings(titles):
+    """Current ``{title: (rating, rating_count)}`` of the cached menus' items."""
+    projection = {"_id": 0, "title": 1, "rating": 1, "rating_count": 1}
+    docs = await collection.find({"title": {"$in": list(titles)}}, projection).to_list()
+    return {doc["title"]: (doc.get("rating"), doc.get("rating_count")) for doc in docs}
+
+
+# Serialized menu, rebuilt only when the scraper bumps the menu version; ratings are overlaid separately
+menu_cache = AsyncMenuCache(
+    collectionMenuMeta,
+    load_current_food_items,
+    load_ratings=load_menu_ratings,
+    poll_interval=float(os.environ.get("MENU_VERSION_POLL_SECONDS", 30)),
+)
+
+
+@app.route('/api/getCurrentFoodItems', methods=['GET'])
+@firebase_token_required
+async def get_current_food_items():
+    """Retrieve current food items (same query parameters as app.py)."""
+    try:
+        params = menu_params(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        etag, body = await menu_cache.get(**params)
+        if request.if_none_match.contains(etag):
+            response = await make_response("", 304)
+        else:
+            response = await make_response(body, 200)
+            response.mimetype = "application/json"
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except LookupError as e:
+        return jsonify({"message": str(e)}), 404
+    except Exception as e:
+        print(f"Error in getCurrentFoodItems: {e}")
+        return jsonify({"message": "Failed to retrieve food items"}), 500
+
+
+# Search index over the whole catalog, refreshed when the scraper adds or changes catalog items
+search_index = SearchIndex()
+search_refresh_lock = asyncio.Lock()
+
+
+async def refresh_search_index():
+    """Re-index catalog items that are new or changed (by fingerprint) since the last refresh."""
+    version = await menu_cache.catalog_version()
+    if search_index.version == version:
+        return
+    async with search_refresh_lock:
+        if search_index.version == version:
+            return
+        fingerprints = {
+            doc["title"]: doc.get("fingerprint")
+            for doc in await collection.find({}, {"title": 1, "fingerprint": 1, "_id": 0}).to_list()
+            if "title" in doc
+        }
+        changed, removed = search_index.stale(fingerprints)
+        query = {"title": {"$in": changed}} if len(search_index) else {}
+        items = await collection.find(query, SEARCH_PROJECTION).to_list() if changed else []
+        search_index.update(items, removed, version)
+        print(f"Search index refreshed: {len(items)} items re-indexed, {len(removed)} removed.")
+
+
+@app.route('/api/searchFood', methods=['GET'])
+@firebase_token_required
+async def search_food():
+    """Search the food catalog by title, ingredients, station and labels.
+
+    Query parameters: ``q`` and optional ``limit``. Matches word prefixes and
+    single-character typos; every word must match and the best matches come first.
+    """
+    try:
+        params = search_params(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        await refresh_search_index()
+        return jsonify({"results": search_results(search_index.search(**params))}), 200
+    except Exception as e:
+        print(f"Error in searchFood: {e}")
+        return jsonify({"message": "Failed to search food items"}), 500
+
+
+# Nutrient matrix of the current menu for /api/planMeal, rebuilt when the menu version moves
+planner = None
+planner_lock = asyncio.Lock()
+
+
+async def current_planner():
+    """Return the meal planner for the current menu version and date."""
+    global planner
+    # Ratings don't affect plans, so only a new scrape or a new day rebuilds the matrix
+    version = (await menu_cache.current_version(), menu_today())
+    async with planner_lock:
+        if planner is None or planner.version != version:
+            # numpy is only imported once someone plans a meal
+            from meal_planner import MealPlanner
+            planner = MealPlanner(await load_current_food_items(fields=PLANNER_FIELDS), version)
+        return planner
+
+
+@app.route('/api/planMeal', methods=['POST'])
+@firebase_token_required
+async def plan_meal():
+    """Suggest combinations of today's menu items that best meet macro targets.
+
+    Body: ``targets`` (any of calories, protein, carbs, fat), optional ``labels``
+    every item must have (e.g. vegan, gluten), ``dining_hall``, ``meal_period``,
+    ``max_items``, ``max_servings`` and ``results``.
+    """
+    try:
+        params = plan_params(await request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        plans = (await current_planner()).plan(**params)
+        return jsonify({"plans": plans}), 200
+    except Exception as e:
+        print(f"Error in planMeal: {e}")
+        return jsonify({"message": "Failed to plan meal"}), 500
+
+
+async def apply_macro_deltas(uid, deltas):
+    """Atomically add deltas to a user's macros, clamping each at zero.
+
+    Returns the updated macros, or None if the user does not exist.
+    """
+    updated_user = await collectionMisc.find_one_and_update(
+        {"uid": uid},
+        macro_update(deltas),
+        projection={"macros": 1, "_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    return updated_user["macros"] if updated_user else None
+
+
+async def record_history(uid, items, deltas):
+    """Append logged items to the user's macro history and add them to its day and week rollups.
+
+    Runs after the macros are committed, so a failure is logged rather than
+    failing the request (which a client retry would count twice).
+    """
+    now = datetime.now(timezone.utc)
+    operations = history_updates(uid, local_day(now), history_entries(items, now), deltas)
+    try:
+        try:
+            await collectionHistory.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # A concurrent first log of the day or week created the document; re-apply the upserts that lost
+            await collectionHistory.bulk_write(failed_upserts(e, operations), ordered=False)
+    except Exception as e:
+        print(f"Error recording macro history for {uid}: {e}")
+
+
+@app.route('/api/updateMacros', methods=['POST'])
+@firebase_token_required
+async def update_macros():
+    """Update user macros."""
+    try:
+        data = await request.get_json()
+        print("Received data:", data)
+
+        uid = data.get('uid')
+        serving_size = data.get('serving_size')
+        food_item = data.get('food_item')
+
+        if not uid or not serving_size or not food_item:
+            return jsonify({"message": "Missing required fields"}), 400
+
+        deltas = macro_deltas(food_item, serving_size)
+        macros = await apply_macro_deltas(uid, deltas)
+        if macros is not None:
+            await record_history(uid, [{"food_item": food_item, "serving_size": serving_size}], deltas)
+            print(f"Updated user macros: {macros}")
+            return jsonify({"message": "Macros updated successfully", "macros": macros}), 200
+        else:
+            return jsonify({"message": "User does not exist"}), 404
+    except Exception as e:
+        print(f"Error in update_macros: {e}")
+        return jsonify({"message": "Failed to update macros"}), 500
+
+
+@app.route('/api/logMeal', methods=['POST'])
+@firebase_token_required
+async def log_meal():
+    """Add the macros of several food items to the user in a single write."""
+    try:
+        data = await request.get_json()
+        print("Received data:", data)
+
+        uid = data.get('uid')
+        items = data.get('items')
+
+        if not uid or not items:
+            return jsonify({"message": "Missing required fields"}), 400
+
+        try:
+            deltas = meal_deltas(items)
+        except ValueError as e:
+            return jsonify({"message": str(e)}), 400
+
+        macros = await apply_macro_deltas(uid, deltas)
+        if macros is not None:
+            await record_history(uid, items, deltas)
+            print(f"Updated user macros: {macros}")
+            return jsonify({"message": "Meal logged successfully", "macros": macros}), 200
+        else:
+            return jsonify({"message": "User does not exist"}), 404
+    except Exception as e:
+        print(f"Error in log_meal: {e}")
+        return jsonify({"message": "Failed to log meal"}), 500
+
+
+@app.route('/api/getMacroHistory', methods=['GET'])
+@firebase_token_required
+async def get_macro_history():
+    """Retrieve the user's daily or weekly macro totals over a date range.
+
+    Query parameters: ``period`` (day or week), ``start`` and ``end`` (YYYY-MM-DD,
+    default the last 7 days) and ``entries=true`` to include each day's logged items.
+    """
+    try:
+        params = history_params(request.args, local_day(datetime.now(timezone.utc)))
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        query, projection = history_query(request.uid, **params)
+        history = await collectionHistory.find(query, projection).sort("start", 1).to_list()
+        return jsonify({"period": params["period"], "history": history}), 200
+    except Exception as e:
+        print(f"Error in getMacroHistory: {e}")
+        return jsonify({"message": "Failed to fetch macro history"}), 500
+
+
+@app.route('/api/bootstrap', methods=['GET'])
+@firebase_token_required
+async def bootstrap():
+    """Retrieve what the home page needs in one request (same query parameters as getCurrentFoodItems)."""
+    try:
+        params = menu_params(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        uid = request.uid  # Retrieved from the authentication decorator
+        (_, menu_body), rated_docs, user = await asyncio.gather(
+            menu_cache.get(**params),
+            collectionRatings.find({"uid": uid}, {"title": 1, "_id": 0}).to_list(),
+            collectionMisc.find_one({"uid": uid}, {"macros": 1, "_id": 0}),
+        )
+        response = await make_response(bootstrap_body(menu_body, [doc["title"] for doc in rated_docs], user), 200)
+        response.mimetype = "application/json"
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    except LookupError as e:
+        return jsonify({"message": str(e)}), 404
+    except Exception as e:
+        print(f"Error in bootstrap: {e}")
+        return jsonify({"message": "Failed to load home page data"}), 500
+
+
+@app.route('/api/getUserRatedFood', methods=['GET'])
+@firebase_token_required
+async def get_user_rated_food():
+    """Retrieve list of food items rated by the user."""
+    try:
+        uid = request.uid  # Retrieved from the authentication decorator
+        print(f"Fetching rated food for user UID: {uid}")
+
+        docs = await collectionRatings.find({"uid": uid}, {"title": 1, "_id": 0}).to_list()
+        return jsonify({"ratedFood": [doc["title"] for doc in docs]}), 200
+    except Exception as e:
+        print(f"Error in getUserRatedFood: {e}")
+        return jsonify({"message": "Failed to fetch user rated food"}), 500
+
+
+@app.route('/api/makeUser', methods=['POST'])
+@firebase_token_required
+async def make_user():
+    """Create a new user in the database."""
+    try:
+        data = await request.get_json()
+        uid = data.get('uid')
+
+        existing_user = await collectionMisc.find_one({"uid": uid})
+        if existing_user:
+            return jsonify({"message": "User already exists"}), 200
+
+        new_user = {"uid": uid, "macros": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}}
+        await collectionMisc.insert_one(new_user)
+        return jsonify({"message": "User created successfully"}), 201
+    except Exception as e:
+        print(f"Error in make_user: {e}")
+        return jsonify({"message": "Failed to create user"}), 500
+
+
+@app.route('/api/getUserMacros', methods=['GET'])
+@firebase_token_required
+async def get_user_macros():
+    """Retrieve user's current macros."""
+    try:
+        uid = request.uid  # Retrieved from the authentication decorator
+        print(f"Fetching macros for user UID: {uid}")
+
+        user = await collectionMisc.find_one({"uid": uid})
+        if user:
+            macros = user.get("macros", {"calories": 0, "protein": 0, "carbs": 0, "fat": 0})
+            return jsonify({"macros": macros}), 200
+        else:
+            return jsonify({"message": "User does not exist"}), 404
+    except Exception as e:
+        print(f"Error in getUserMacros: {e}")
+        return jsonify({"message": "Failed to fetch user macros"}), 500
+
+
+async def update_leaderboard(item):
+    """Refresh a rated item's leaderboard entry, without waiting for the server to acknowledge it.
+
+    build_leaderboard.py repairs any entry a lost write leaves behind.
+    """
+    try:
+        await collectionLeaderboard.with_options(write_concern=WriteConcern(w=0)).update_one(
+            *leaderboard_update(item), upsert=True
+        )
+    except DuplicateKeyError:
+        # A newer rating of this item already refreshed the entry (only reported by acknowledged writes)
+        pass
+
+
+@app.route('/api/getLeaderboard', methods=['GET'])
+@firebase_token_required
+async def get_leaderboard():
+    """Retrieve the top-rated items of a dining hall's meal period.
+
+    Query parameters: ``dining_hall``, ``meal_period`` and optional ``limit``. Items
+    are ranked by their Bayesian-adjusted average rating.
+    """
+    try:
+        params = leaderboard_params(request.args)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        query = {"dining_hall": params["dining_hall"], "meal_period": params["meal_period"]}
+        projection = {"_id": 0, "rating_version": 0}
+        leaderboard = await collectionLeaderboard.find(query, projection).sort("score", -1).limit(params["limit"]).to_list()
+        return jsonify({"leaderboard": leaderboard}), 200
+    except Exception as e:
+        print(f"Error in getLeaderboard: {e}")
+        return jsonify({"message": "Failed to fetch leaderboard"}), 500
+
+
+@app.route('/api/rate', methods=['POST'])
+@firebase_token_required
+async def update_rating():
+    """Update the caller's rating for a food item."""
+    try:
+        data = await request.get_json()
+        print("Received data:", data)
+
+        title = data.get('title')
+        new_rating = data.get('rating')
+        # Votes are keyed on the verified token's uid; a uid in the body is ignored
+        uid = request.uid
+
+        if not title or not new_rating:
+            return jsonify({"message": "Missing required fields"}), 400
+
+        # The food update depends on the user's previous rating, so these two writes stay sequential
+        previous = await collectionRatings.find_one_and_update(
+            {"uid": uid, "title": title},
+            rating_upsert(new_rating),
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+        updated_item = await collection.find_one_and_update(
+            {"title": title},
+            food_rating_update(previous, new_rating),
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated_item is None:
+            if previous is None:
+                await collectionRatings.delete_one({"uid": uid, "title": title})
+            return jsonify({"message": "Food item does not exist"}), 404
+
+        await update_leaderboard(updated_item)
+        # Other instances pick the new rating up within MENU_VERSION_POLL_SECONDS
+        menu_cache.update_rating(updated_item)
+
+        send_item = json.loads(json_util.dumps(updated_item))
+        return jsonify(send_item), 200
+    except Exception as e:
+        print(f"Error in update_rating: {e}")
+        return jsonify({"message": "Failed to update rating"}), 500
+
+
+@app.route('/api/resetMacros', methods=['POST'])
+@firebase_token_required
+async def resetMacros():
+    data = await request.get_json()
+    print("Received data:", data)
+    uid = data.get('uid')
+    if not uid:
+        return jsonify({"message": "Missing required fields"}), 400
+    user = await collectionMisc.find_one({"uid": uid})
+    if user:
+        await collectionMisc.find_one_and_update(
+            {"uid": uid},
+            {"$set": {"macros": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}}},
+            return_document=ReturnDocument.AFTER
+        )
+        return jsonify({"message": "Macros reset successfully"}), 200
+    else:
+        return jsonify({"message": "User does not exist"}), 404
+
+
+if __name__ == '__main__':
+    app.run(debug=False)
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, jsonify
+
+from clients import init_firebase
+from metrics import GaugeCallback, observe_firebase
+
+
+class TokenCache:
+    """Bounded LRU cache of decoded Firebase ID tokens.
+
+    Entries expire at the token's ``exp`` claim, and never live longer than
+    ``max_ttl`` seconds so a revoked token is only honoured for a bounded window.
+    """
+
+    def __init__(self, maxsize=1024, max_ttl=300):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # token hash -> (expires_at, decoded_token)
+
+    @staticmethod
+    def _key(id_token):
+        return hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+
+    def get(self, id_token):
+        """Return the cached decoded token, or None if it is missing or expired."""
+        key = self._key(id_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, id_token, decoded_token):
+        """Cache a verified token until its exp claim (capped at max_ttl)."""
+        expires_at = min(decoded_token.get("exp", 0), time.time() + self.max_ttl)
+        if expires_at <= time.time():
+            return
+        key = self._key(id_token)
+        with self._lock:
+            self._entries[key] = (expires_at, decoded_token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache(
+    maxsize=int(os.environ.get("AUTH_CACHE_SIZE", 1024)),
+    max_ttl=float(os.environ.get("AUTH_CACHE_MAX_TTL", 300)),
+)
+
+# When set, verification also asks Firebase whether the token has been revoked
+check_revoked = os.environ.get("FIREBASE_CHECK_REVOKED", "").lower() in ("1", "true", "yes")
+
+
+def bearer_token(headers):
+    """Return the token from an ``Authorization: Bearer`` header, or None."""
+    if 'Authorization' in headers:
+        parts = headers['Authorization'].split()
+        if len(parts) == 2 and parts[0] == 'Bearer':
+            return parts[1]
+    return None
+
+
+GaugeCallback("auth_token_cache", "Decoded token cache size, hits and misses.", "stat", token_cache.stats)
+
+
+def verify_with_firebase(id_token):
+    """Verify a token with Firebase (blocking) and cache the result."""
+    init_firebase()
+    from firebase_admin import auth
+    started = time.perf_counter()
+    try:
+        decoded_token = auth.verify_id_token(id_token, check_revoked=check_revoked)
+    except Exception:
+        observe_firebase(time.perf_counter() - started, "error")
+        raise
+    observe_firebase(time.perf_counter() - started, "ok")
+    token_cache.put(id_token, decoded_token)
+    return decoded_token
+
+
+def verify_token(id_token):
+    """Verify a Firebase ID token, reusing the cached result when possible."""
+    decoded_token = token_cache.get(id_token)
+    if decoded_token is None:
+        decoded_token = verify_with_firebase(id_token)
+    return decoded_token
+
+
+# Firebase authentication decorator
+def firebase_token_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        # Get the token from the Authorization header
+        id_token = bearer_token(request.headers)
+        if not id_token:
+            return jsonify({'message': 'Unauthorized'}), 401
+        try:
+            # Verify the token with Firebase
+            decoded_token = verify_token(id_token)
+            request.uid = decoded_token['uid']
+            return f(*args, **kwargs)
+        except Exception as e:
+            print(f"Authentication error: {e}")
+            return jsonify({'message': 'Unauthorized'}), 401
+    return decorated_function
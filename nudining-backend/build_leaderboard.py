@@ -0,0 +1,40 @@
+"""Rebuild the leaderboard collection from the food catalog.
+
+/api/rate keeps the leaderboard up to date incrementally; run this once to
+backfill it, or again after changing LEADERBOARD_PRIOR_MEAN/WEIGHT. Those
+updates are unacknowledged, so this also repairs any a failed write left stale.
+"""
+import os
+
+from pymongo import MongoClient
+
+from indexes import ensure_indexes
+from queries import bayesian_score_expr
+
+
+def build_leaderboard(collection, collectionLeaderboard):
+    """Merge every rated catalog item's entry into the leaderboard collection."""
+    ensure_indexes([(collectionLeaderboard, [("title", 1)], {"unique": True})])
+    collection.aggregate([
+        {"$match": {"rating_count": {"$gt": 0}}},
+        {"$project": {
+            "_id": 0,
+            "title": 1,
+            "dining_hall": 1,
+            "meal_period": 1,
+            "rating_count": 1,
+            "average": {"$divide": ["$rating", "$rating_count"]},
+            "score": bayesian_score_expr("$rating", "$rating_count"),
+            "rating_version": {"$ifNull": ["$rating_version", 0]},
+        }},
+        {"$merge": {"into": collectionLeaderboard.name, "on": "title", "whenMatched": "replace"}},
+    ])
+    return collectionLeaderboard.count_documents({})
+
+
+if __name__ == '__main__':
+    client = MongoClient(os.environ.get("MONGOURI"))
+    db = client[os.environ.get("MONGODB_NAME")]
+    count = build_leaderboard(db[os.environ.get("MONGO_COLLECTION_NAME")], db[os.environ.get("LEADERBOARD", "leaderboard")])
+    print(f"Leaderboard has {count} items.")
+    client.close()
@@ -0,0 +1,84 @@
+"""Lazily created Mongo and Firebase clients, shared for the life of the process.
+
+Nothing connects at import time; the first request pays for initialization and
+later requests (including warm Lambda invocations) reuse the same clients.
+"""
+import os
+import threading
+import time
+
+_lock = threading.Lock()
+_mongo_client = None
+_async_mongo_client = None
+_firebase_ready = False
+
+# How long each lazy initialization took, in milliseconds
+init_timings = {}
+
+
+def get_db():
+    """Return the app's Mongo database, creating the client on first use."""
+    global _mongo_client
+    if _mongo_client is None:
+        with _lock:
+            if _mongo_client is None:
+                started = time.perf_counter()
+                from pymongo import MongoClient
+                from metrics import mongo_listener
+                _mongo_client = MongoClient(os.environ.get("MONGOURI"), event_listeners=[mongo_listener])
+                init_timings["mongo_ms"] = (time.perf_counter() - started) * 1000
+    return _mongo_client[os.environ.get("MONGODB_NAME")]
+
+
+def get_async_db():
+    """Return the app's Mongo database on an async client (for the ASGI app).
+
+    Only called from the event loop, so creating the client needs no lock.
+    """
+    global _async_mongo_client
+    if _async_mongo_client is None:
+        started = time.perf_counter()
+        from pymongo import AsyncMongoClient
+        from metrics import mongo_listener
+        _async_mongo_client = AsyncMongoClient(os.environ.get("MONGOURI"), event_listeners=[mongo_listener])
+        init_timings["mongo_ms"] = (time.perf_counter() - started) * 1000
+    return _async_mongo_client[os.environ.get("MONGODB_NAME")]
+
+
+def init_firebase():
+    """Initialize the default Firebase app on first use."""
+    global _firebase_ready
+    if not _firebase_ready:
+        with _lock:
+            if not _firebase_ready:
+                started = time.perf_counter()
+                import firebase_admin
+                from firebase_admin import credentials
+                try:
+                    firebase_admin.get_app()
+                except ValueError:
+                    firebase_admin.initialize_app(credentials.Certificate(os.environ.get("cred")))
+                _firebase_ready = True
+                init_timings["firebase_ms"] = (time.perf_counter() - started) * 1000
+
+
+class LazyCollection:
+    """Stands in for a Mongo collection whose name comes from an environment variable.
+
+    The collection (and the client behind it) is resolved on first attribute access.
+    Pass ``database=get_async_db`` for an async collection.
+    """
+
+    def __init__(self, env_name, default=None, database=get_db):
+        self._env_name = env_name
+        self._default = default
+        self._database = database
+        self._collection = None
+
+    def _resolve(self):
+        if self._collection is None:
+            self._collection = self._database()[os.environ.get(self._env_name, self._default)]
+        return self._collection
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
@@ -0,0 +1,52 @@
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+
+def api_index_specs(collection, collectionToday, collectionMisc, collectionRatings, collectionHistory,
+                    collectionLeaderboard):
+    """Index specs for the title/uid lookups used by every API endpoint."""
+    return [
+        (collection, [("title", ASCENDING)], {"unique": True}),
+        (collectionToday, [("title", ASCENDING)], {}),
+        (collectionMisc, [("uid", ASCENDING)], {"unique": True}),
+        (collectionRatings, [("uid", ASCENDING), ("title", ASCENDING)], {"unique": True}),
+        (collectionRatings, [("pending", ASCENDING)], {"sparse": True}),
+        (collectionHistory, [("uid", ASCENDING), ("period", ASCENDING), ("start", ASCENDING)], {"unique": True}),
+        (collectionLeaderboard, [("title", ASCENDING)], {"unique": True}),
+        (collectionLeaderboard, [("dining_hall", ASCENDING), ("meal_period", ASCENDING), ("score", DESCENDING)], {}),
+    ]
+
+
+def ensure_indexes(specs):
+    """Create any missing indexes and return the names of the ones that were created.
+
+    ``specs`` is a list of ``(collection, keys, options)`` tuples, where ``keys`` is
+    a pymongo index key list and ``options`` are passed to ``create_index``.
+    """
+    created = []
+    for coll, keys, options in specs:
+        existing = coll.index_information()
+        try:
+            name = coll.create_index(keys, **options)
+        except OperationFailure as e:
+            # Most likely existing duplicates preventing a unique index
+            print(f"Could not create index {keys} on {coll.name}: {e}")
+            continue
+        if name not in existing:
+            created.append(f"{coll.name}.{name}")
+    return created
+
+
+async def ensure_indexes_async(specs):
+    """``ensure_indexes`` for async collections."""
+    created = []
+    for coll, keys, options in specs:
+        existing = await coll.index_information()
+        try:
+            name = await coll.create_index(keys, **options)
+        except OperationFailure as e:
+            print(f"Could not create index {keys} on {coll.name}: {e}")
+            continue
+        if name not in existing:
+            created.append(f"{coll.name}.{name}")
+    return created
@@ -0,0 +1,48 @@
+"""AWS Lambda entry point wrapping the Flask app.
+
+Heavy imports (Flask, pymongo, firebase_admin) are deferred to the first
+invocation, and the Mongo client and Firebase app are created lazily and reused
+across warm invocations. Each cold start logs one JSON line with its import and
+init timings.
+"""
+import json
+import time
+
+_module_started = time.perf_counter()
+
+_app = None
+_cold_start = True
+_app_import_ms = None
+
+
+def _load_app():
+    """Import the Flask app (and the WSGI adapter) on first use."""
+    global _app, _app_import_ms
+    started = time.perf_counter()
+    import serverless_wsgi
+    from app import app
+    _app = (serverless_wsgi, app)
+    _app_import_ms = (time.perf_counter() - started) * 1000
+    return _app
+
+
+def handler(event, context):
+    global _cold_start
+    started = time.perf_counter()
+    serverless_wsgi, app = _app or _load_app()
+    response = serverless_wsgi.handle_request(app, event, context)
+
+    if _cold_start:
+        _cold_start = False
+        from clients import init_timings
+        print(json.dumps({
+            "cold_start": True,
+            "handler_import_ms": round(_module_import_ms, 1),
+            "app_import_ms": round(_app_import_ms, 1),
+            **{name: round(ms, 1) for name, ms in init_timings.items()},
+            "first_request_ms": round((time.perf_counter() - started) * 1000, 1),
+        }))
+    return response
+
+
+_module_import_ms = (time.perf_counter() - _module_started) * 1000
@@ -0,0 +1,313 @@
+"""Offline load test for the Flask API.
+
+Seeds a database with a synthetic catalog and user base, replaces Firebase
+token verification with a stub (the bearer token is the uid), then drives a mix
+of endpoints from concurrent workers through the app's test client and reports
+throughput and p50/p95/p99 latency per endpoint:
+
+    MONGOURI=mongodb://localhost:27017 python loadtest.py --db nudining_loadtest
+    python loadtest.py --in-memory --foods 500 --today 100 --users 2000 --requests 1000 --concurrency 8 \
+        --compare loadtest_baselines/in-memory.json
+
+``--in-memory`` uses mongomock, which scans whole collections and slows down
+sharply as they grow, so its numbers are only for comparing runs against the
+committed baseline (same config). Refresh a baseline with ``--output``.
+
+The target database is dropped and re-seeded on every run, so never point it
+at a real one.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DINING_HALLS = ["The Eatery at Stetson East", "United Table at International Village", "Outtakes"]
+MEAL_PERIODS = ["Breakfast", "Lunch", "Dinner", "Everyday"]
+LABELS = ["vegan", "gluten", "protein"]
+
+# (name, weight) of each request in the mix; the home page loads through /api/bootstrap
+SCENARIOS = [
+    ("GET /api/bootstrap?dining_hall", 25),
+    ("GET /api/getCurrentFoodItems?dining_hall&limit", 5),
+    ("GET /api/getUserMacros", 10),
+    ("GET /api/searchFood", 10),
+    ("POST /api/planMeal", 5),
+    ("GET /api/getLeaderboard", 5),
+    ("GET /api/getMacroHistory", 5),
+    ("POST /api/logMeal", 10),
+    ("POST /api/updateMacros", 10),
+    ("POST /api/rate", 15),
+]
+
+
+def configure_environment(db_name):
+    """Point the app at the load test database before it is imported."""
+    os.environ.setdefault("MONGOURI", "mongodb://localhost:27017")
+    os.environ["MONGODB_NAME"] = db_name
+    os.environ["MONGO_COLLECTION_NAME"] = "food"
+    os.environ["TODAYSFOOD"] = "todaysFood"
+    os.environ["MISC"] = "misc"
+    os.environ["MENU_META"] = "menuMeta"
+    os.environ["RATINGS"] = "ratings"
+    os.environ["ENSURE_INDEXES"] = "0"
+    os.environ.setdefault("SLOW_REQUEST_MS", "1000000")
+
+
+def stub_firebase():
+    """Accept any bearer token, using the token itself as the uid."""
+    import clients
+    from firebase_admin import auth
+
+    clients._firebase_ready = True
+    auth.verify_id_token = lambda id_token, check_revoked=False: {
+        "uid": id_token,
+        "exp": time.time() + 3600,
+    }
+
+
+def patch_mongomock_bulk(mongomock):
+    """Let mongomock's bulk builder take the ``sort`` argument pymongo 4.9+ passes for UpdateOne/ReplaceOne."""
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        def add(self, *args, sort=None, _add=getattr(builder, name), **kwargs):
+            if sort:
+                raise NotImplementedError("mongomock bulk writes can't sort")
+            return _add(self, *args, **kwargs)
+        setattr(builder, name, add)
+
+
+def food_item(index, rng):
+    """A synthetic catalog item shaped like the scraper's output."""
+    def amount(value, unit):
+        return {"value": value, "unit": unit, "text": f"{value}{unit}"}
+
+    return {
+        "title": f"Food {index:05d}",
+        "dining_hall": rng.choice(DINING_HALLS),
+        "meal_period": rng.choice(MEAL_PERIODS),
+        "portion_size": f"{rng.randint(1, 3)} each",
+        "table_caption": f"Station {index % 12}",
+        "nutritional_info": {
+            "Calories": amount(rng.randint(50, 900), "kcal"),
+            "Protein (g)": amount(rng.randint(0, 60), "g"),
+            "Total Carbohydrates (g)": amount(rng.randint(0, 120), "g"),
+            "Total Fat (g)": amount(rng.randint(0, 50), "g"),
+        },
+        "labels": rng.sample(LABELS, rng.randint(0, 2)),
+        "ingredients": "water, salt",
+        "rating": 0,
+        "rating_count": 0,
+    }
+
+
+def seed(db, app_module, foods, today, users, ratings_per_user, rng):
+    """Drop and fill the load test collections; returns the titles on today's menu."""
+    for name in db.list_collection_names():
+        db.drop_collection(name)
+
+    items = [food_item(index, rng) for index in range(foods)]
+    db["food"].insert_many(items)
+    titles = [item["title"] for item in items]
+    todays_titles = rng.sample(titles, min(today, len(titles)))
+    db["todaysFood"].insert_many([{"title": title} for title in todays_titles])
+
+    db["misc"].insert_many([
+        {"uid": f"user-{index}", "macros": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}}
+        for index in range(users)
+    ])
+    ratings = [
+        {"uid": f"user-{index}", "title": title, "rating": rng.randint(1, 5)}
+        for index in range(users)
+        for title in rng.sample(titles, ratings_per_user)
+    ]
+    if ratings:
+        db["ratings"].insert_many(ratings)
+    app_module.bootstrap_indexes()
+    return todays_titles
+
+
+def make_request(client, scenario, rng, users, items):
+    """Send one request for a scenario; returns its status code."""
+    uid = f"user-{rng.randrange(users)}"
+    headers = {"Authorization": f"Bearer {uid}"}
+    item = rng.choice(items)
+    if scenario == "GET /api/bootstrap?dining_hall":
+        query = {"dining_hall": rng.choice(DINING_HALLS)}
+        response = client.get("/api/bootstrap", query_string=query, headers=headers)
+    elif scenario == "GET /api/getCurrentFoodItems?dining_hall&limit":
+        query = {"dining_hall": rng.choice(DINING_HALLS), "limit": 50}
+        response = client.get("/api/getCurrentFoodItems", query_string=query, headers=headers)
+    elif scenario == "GET /api/getUserMacros":
+        response = client.get("/api/getUserMacros", headers=headers)
+    elif scenario == "GET /api/searchFood":
+        query = {"q": rng.choice([item["title"], rng.choice(LABELS), "station"])}
+        response = client.get("/api/searchFood", query_string=query, headers=headers)
+    elif scenario == "POST /api/planMeal":
+        body = {
+            "targets": {"calories": rng.randint(400, 900), "protein": rng.randint(20, 60)},
+            "dining_hall": rng.choice(DINING_HALLS),
+        }
+        response = client.post("/api/planMeal", json=body, headers=headers)
+    elif scenario == "GET /api/getLeaderboard":
+        query = {"dining_hall": rng.choice(DINING_HALLS), "meal_period": rng.choice(MEAL_PERIODS)}
+        response = client.get("/api/getLeaderboard", query_string=query, headers=headers)
+    elif scenario == "GET /api/getMacroHistory":
+        query = {"period": rng.choice(["day", "week"])}
+        response = client.get("/api/getMacroHistory", query_string=query, headers=headers)
+    elif scenario == "POST /api/logMeal":
+        meal = [{"food_item": rng.choice(items), "serving_size": rng.randint(1, 2)} for _ in range(3)]
+        response = client.post("/api/logMeal", json={"uid": uid, "items": meal}, headers=headers)
+    elif scenario == "POST /api/updateMacros":
+        body = {"uid": uid, "food_item": item, "serving_size": 1}
+        response = client.post("/api/updateMacros", json=body, headers=headers)
+    else:
+        body = {"uid": uid, "title": item["title"], "rating": rng.randint(1, 5)}
+        response = client.post("/api/rate", json=body, headers=headers)
+    return response.status_code
+
+
+def run(app, requests_total, concurrency, users, items, seed_value):
+    """Drive the request mix; returns ``({scenario: [ms...]}, {scenario: errors}, elapsed seconds)``."""
+    names = [name for name, _ in SCENARIOS]
+    weights = [weight for _, weight in SCENARIOS]
+    schedule = random.Random(seed_value).choices(names, weights, k=requests_total)
+    latencies = {name: [] for name in names}
+    errors = dict.fromkeys(names, 0)
+    lock = threading.Lock()
+    local = threading.local()
+    worker_ids = itertools.count()
+
+    def worker(position):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+            local.rng = random.Random(seed_value * 1000 + next(worker_ids))
+        scenario = schedule[position]
+        started = time.perf_counter()
+        try:
+            status = make_request(local.client, scenario, local.rng, users, items)
+        except Exception:
+            status = None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies[scenario].append(elapsed_ms)
+            if status not in (200, 201, 304):
+                errors[scenario] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(requests_total)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(latencies, errors, elapsed):
+    """Per-scenario request counts, errors, throughput and latency percentiles."""
+    report = {}
+    for name, samples in latencies.items():
+        if not samples:
+            continue
+        cuts = statistics.quantiles(samples, n=100, method="inclusive") if len(samples) > 1 else samples * 99
+        report[name] = {
+            "requests": len(samples),
+            "errors": errors[name],
+            "throughput_rps": round(len(samples) / elapsed, 1),
+            "p50_ms": round(cuts[49], 2),
+            "p95_ms": round(cuts[94], 2),
+            "p99_ms": round(cuts[98], 2),
+        }
+    return report
+
+
+def print_report(report, baseline=None):
+    """Print the report as a table, with p95 change against a baseline when given."""
+    header = f"{'endpoint':<50} {'reqs':>6} {'errs':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    if baseline:
+        header += f" {'p95 vs base':>12}"
+    print(header)
+    for name, row in report.items():
+        line = (f"{name:<50} {row['requests']:>6} {row['errors']:>5} {row['throughput_rps']:>8} "
+                f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}")
+        base = (baseline or {}).get(name)
+        if base:
+            line += f" {(row['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100:>+11.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the nudining API.")
+    parser.add_argument("--in-memory", action="store_true", help="use mongomock instead of MONGOURI")
+    parser.add_argument("--db", default="nudining_loadtest", help="database to drop and seed")
+    parser.add_argument("--foods", type=int, default=5000)
+    parser.add_argument("--today", type=int, default=400, help="items on today's menu")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--ratings-per-user", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=5000, help="total requests to send")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the report (e.g. a new baseline) to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare p95 latency against")
+    args = parser.parse_args()
+
+    configure_environment(args.db)
+    import clients
+    if args.in_memory:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("--in-memory needs mongomock (pip install mongomock)")
+        patch_mongomock_bulk(mongomock)
+        clients._mongo_client = mongomock.MongoClient()
+    stub_firebase()
+    import app as app_module
+
+    rng = random.Random(args.seed)
+    db = clients.get_db()
+    print(f"Seeding {args.foods} foods ({args.today} today), {args.users} users...")
+    todays_titles = seed(db, app_module, args.foods, args.today, args.users, args.ratings_per_user, rng)
+    items = list(db["food"].find({"title": {"$in": todays_titles}}, {"_id": 0}))
+
+    print(f"Sending {args.requests} requests from {args.concurrency} workers...")
+    # Handlers print every request body; keep the report readable
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        latencies, errors, elapsed = run(
+            app_module.app, args.requests, args.concurrency, args.users, items, args.seed
+        )
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    report = summarize(latencies, errors, elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["endpoints"]
+    print(f"{args.requests} requests in {elapsed:.1f}s ({args.requests / elapsed:.1f} req/s)")
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "config": {
+                    key: getattr(args, key)
+                    for key in ("in_memory", "foods", "today", "users", "ratings_per_user",
+                                "requests", "concurrency", "seed")
+                },
+                "python": platform.python_version(),
+                "total_rps": round(args.requests / elapsed, 1),
+                "endpoints": report,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {args.output}")
+
+    db.client.drop_database(args.db)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Macro-target meal planning over today's menu.
+
+The menu is turned into a dense nutrient matrix once per menu version; a plan
+request then filters it with boolean masks and runs a beam search where every
+step scores all (partial plan, candidate row) pairs in one broadcast, over only
+the macros that have a target, and keeps the best ``beam_width`` of them.
+"""
+import numpy as np
+
+from queries import MACRO_SOURCES
+
+MACROS = list(MACRO_SOURCES)
+
+# Rows whose macros alone exceed a target by more than this factor are pruned
+OVERSHOOT = 1.25
+
+
+class MealPlanner:
+    """Dense nutrient matrix for one menu version.
+
+    ``items`` are menu items with typed ``nutritional_info``; each becomes a row
+    of per-serving calories, protein, carbs and fat, plus a label bitmask and
+    dining hall / meal period codes for constraint filtering.
+    """
+
+    def __init__(self, items, version=None):
+        self.version = version
+        self.items = items
+        self.nutrients = np.array(
+            [
+                [((item.get("nutritional_info") or {}).get(source) or {}).get("value", 0) for source in MACRO_SOURCES.values()]
+                for item in items
+            ],
+            dtype=np.float64,
+        ).reshape(len(items), len(MACROS))
+        self.label_names = sorted({label for item in items for label in item.get("labels") or []})
+        self.label_bits = np.array(
+            [sum(1 << self.label_names.index(label) for label in set(item.get("labels") or [])) for item in items],
+            dtype=np.int64,
+        )
+        self.halls = np.array([item.get("dining_hall") or "" for item in items], dtype=object)
+        self.periods = np.array([item.get("meal_period") or "" for item in items], dtype=object)
+
+    def candidates(self, labels=(), dining_hall=None, meal_period=None):
+        """Indexes of items with every required label, in the given hall and meal period."""
+        mask = np.ones(len(self.items), dtype=bool)
+        for label in labels:
+            if label not in self.label_names:
+                return np.array([], dtype=np.int64)
+            mask &= (self.label_bits & (1 << self.label_names.index(label))) != 0
+        if dining_hall:
+            mask &= self.halls == dining_hall
+        if meal_period:
+            mask &= self.periods == meal_period
+        return np.flatnonzero(mask)
+
+    def plan(self, targets, labels=(), dining_hall=None, meal_period=None, max_items=3, max_servings=1,
+             results=5, beam_width=256):
+        """Best combinations of up to ``max_items`` distinct items for the macro ``targets``.
+
+        Each item may be taken in 1 to ``max_servings`` servings. Plans are scored
+        by the sum of squared relative errors over the macros that have a target.
+        """
+        target = np.array([float(targets.get(macro) or 0) for macro in MACROS])
+        weight = np.array([1.0 if targets.get(macro) else 0.0 for macro in MACROS])
+        limit = np.where(weight > 0, target * OVERSHOOT, np.inf)
+
+        # One row per (item, servings), contiguous per item
+        item_index = np.repeat(self.candidates(labels, dining_hall, meal_period), max_servings)
+        servings = np.tile(np.arange(1, max_servings + 1), len(item_index) // max_servings)
+        macros = self.nutrients[item_index] * servings[:, None]
+        keep = (macros <= limit).all(axis=1)
+        item_index, servings, macros = item_index[keep], servings[keep], macros[keep]
+        if not len(item_index):
+            return []
+
+        # Search in units of each target, over only the macros that have one
+        relative = macros[:, weight > 0] / target[weight > 0]
+
+        def score(totals):
+            error = totals - 1.0
+            return np.einsum("...k,...k->...", error, error)
+
+        def top(scores, count):
+            """Indexes of the ``count`` lowest finite scores, unordered."""
+            if len(scores) > count:
+                best = np.argpartition(scores, count)[:count]
+            else:
+                best = np.arange(len(scores))
+            return best[np.isfinite(scores[best])]
+
+        rows = np.arange(len(item_index))
+        beam = top(score(relative), beam_width)
+        beam_rows = rows[beam][:, None]
+        beam_totals = relative[beam]
+        beam_scores = score(beam_totals)
+        # Only the best ``results`` plans of each size can make the final list
+        kept = top(beam_scores, results)
+        found = [(beam_scores[kept], beam_rows[kept])]
+        for _ in range(max_items - 1):
+            # Extend each partial plan with every later row of a different item, keeping the best beam_width
+            last = beam_rows[:, -1]
+            totals = beam_totals[:, None, :] + relative[None, :, :]
+            scores = score(totals)
+            valid = (rows[None, :] > last[:, None]) & (item_index[None, :] != item_index[last][:, None])
+            valid &= (totals <= OVERSHOOT).all(axis=2)
+            scores[~valid] = np.inf
+            best = top(scores.ravel(), beam_width)
+            if not len(best):
+                break
+            partial, row = np.unravel_index(best, scores.shape)
+            beam_rows = np.concatenate([beam_rows[partial], row[:, None]], axis=1)
+            beam_totals = totals[partial, row]
+            beam_scores = scores[partial, row]
+            kept = top(beam_scores, results)
+            found.append((beam_scores[kept], beam_rows[kept]))
+
+        ranked = [(float(plan_score), combo) for scores, combos in found for plan_score, combo in zip(scores, combos)]
+        ranked.sort(key=lambda entry: entry[0])
+
+        plans = []
+        for plan_score, combo in ranked[:results]:
+            totals = macros[combo].sum(axis=0)
+            plans.append({
+                "items": [
+                    {
+                        "title": self.items[item_index[row]]["title"],
+                        "serving_size": int(servings[row]),
+                        "macros": dict(zip(MACROS, (round(float(v)) for v in macros[row]))),
+                    }
+                    for row in combo
+                ],
+                "totals": dict(zip(MACROS, (round(float(v)) for v in totals))),
+                "score": round(plan_score, 4),
+            })
+        return plans
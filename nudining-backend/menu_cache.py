@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+
+# _id of the document (in the menu meta collection) holding the menu version
+MENU_VERSION_ID = "menu_version"
+
+# _id of the document holding the catalog version, bumped only when the scraper adds or changes catalog items
+CATALOG_VERSION_ID = "catalog_version"
+
+
+def menu_items(result):
+    """The item list of a built menu (a list, or a page dict with ``items``)."""
+    return result["items"] if isinstance(result, dict) else result
+
+
+def built_ratings(result):
+    """``{title: (rating, rating_count)}`` read by a menu build, which is fresher than the snapshot."""
+    return {
+        item["title"]: (item.get("rating"), item.get("rating_count"))
+        for item in menu_items(result)
+        if "title" in item and "rating" in item and "rating_count" in item
+    }
+
+
+class MenuCache:
+    """Caches serialized menu responses until the shared menu version changes.
+
+    Responses are keyed by their query parameters (the most recent ``maxsize``
+    are kept). The version document is polled at most once every
+    ``poll_interval`` seconds, so a warm instance answers menu requests without
+    touching Mongo at all; only the scraper bumps it.
+
+    Ratings change with every vote, so they are kept out of the version: the
+    built items are cached as well, and their ``rating``/``rating_count`` are
+    overlaid from a snapshot when the body is serialized. ``load_ratings(titles)``
+    refreshes the snapshot for the cached titles once per ``poll_interval`` and
+    ``update_rating`` applies this instance's votes at once; either only
+    re-serializes the cached bodies. Each key is rebuilt under its own lock, so a
+    cold key doesn't hold up requests for the others.
+
+    ``catalog_version`` polls the catalog version the same way, for state (like
+    the search index) that only changes when catalog items do.
+    """
+
+    def __init__(self, meta_collection, build, load_ratings=None, poll_interval=30.0, maxsize=128):
+        self.meta_collection = meta_collection
+        self.build = build
+        self.load_ratings = load_ratings
+        self.poll_interval = poll_interval
+        self.maxsize = maxsize
+        self._lock = threading.Lock()  # guards the dicts below, never held across Mongo calls
+        self._poll_lock = threading.Lock()
+        self._key_locks = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._catalog_version = None
+        self._catalog_checked_at = 0.0
+        self._entries = OrderedDict()  # params -> (version, ratings epoch, result, etag, body)
+        self._ratings = {}  # title -> (rating, rating_count)
+        self._ratings_epoch = 0
+        self._ratings_checked_at = time.monotonic()
+
+    def current_version(self):
+        """Return the menu version, re-reading it from Mongo when the poll interval has passed.
+
+        Only one thread polls; the others keep using the version they have.
+        """
+        now = time.monotonic()
+        if self._version is None or now - self._checked_at >= self.poll_interval:
+            if self._poll_lock.acquire(blocking=self._version is None):
+                try:
+                    doc = self.meta_collection.find_one({"_id": MENU_VERSION_ID}, {"version": 1})
+                    self._version = doc.get("version", 0) if doc else 0
+                    self._checked_at = time.monotonic()
+                finally:
+                    self._poll_lock.release()
+        return self._version
+
+    def catalog_version(self):
+        """Return the catalog version, re-reading it from Mongo when the poll interval has passed."""
+        if self._catalog_version is None or time.monotonic() - self._catalog_checked_at >= self.poll_interval:
+            doc = self.meta_collection.find_one({"_id": CATALOG_VERSION_ID}, {"version": 1})
+            self._catalog_version = doc.get("version", 0) if doc else 0
+            self._catalog_checked_at = time.monotonic()
+        return self._catalog_version
+
+    def refresh_ratings(self, force=False):
+        """Re-read the cached titles' ratings once per poll interval (or now, with ``force``)."""
+        if self.load_ratings is None:
+            return
+        if not force and time.monotonic() - self._ratings_checked_at < self.poll_interval:
+            return
+        if not self._poll_lock.acquire(blocking=force):
+            return
+        try:
+            self._ratings_checked_at = time.monotonic()
+            with self._lock:
+                titles = self._cached_titles()
+            self._apply_ratings(self.load_ratings(titles) if titles else {})
+        finally:
+            self._poll_lock.release()
+
+    def _cached_titles(self):
+        return {item["title"] for entry in self._entries.values() for item in menu_items(entry[2]) if "title" in item}
+
+    def _apply_ratings(self, ratings):
+        with self._lock:
+            if any(self._ratings.get(title) != value for title, value in ratings.items()):
+                self._ratings.update(ratings)
+                self._ratings_epoch += 1
+
+    def update_rating(self, item):
+        """Show a food document's new rating in every cached menu on this instance."""
+        self._apply_ratings({item["title"]: (item.get("rating"), item.get("rating_count"))})
+
+    def get(self, **params):
+        """Return ``(etag, body)`` for ``build(**params)``, rebuilding it if the version moved.
+
+        Parameter values must be hashable.
+        """
+        key = tuple(sorted(params.items()))
+        version = self.current_version()
+        self.refresh_ratings()
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                result = self.build(**params)
+                self._apply_ratings(built_ratings(result))
+                entry = self._store(key, version, result)
+            elif entry[1] != self._ratings_epoch:
+                entry = self._store(key, version, entry[2])
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            return entry[3], entry[4]
+
+    def _overlay(self, result):
+        """``result`` with its items' ratings replaced from the snapshot."""
+        ratings = self._ratings
+        items = [
+            {**item, **{
+                field: value
+                for field, value in zip(("rating", "rating_count"), ratings[item["title"]])
+                if field in item
+            }} if item.get("title") in ratings else item
+            for item in menu_items(result)
+        ]
+        return {**result, "items": items} if isinstance(result, dict) else items
+
+    def _store(self, key, version, result):
+        """Serialize a built menu with current ratings, cache it under ``key`` and return the entry."""
+        with self._lock:
+            epoch = self._ratings_epoch
+            overlaid = self._overlay(result)
+        body = json.dumps(overlaid, separators=(",", ":")).encode("utf-8")
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        entry = (version, epoch, result, etag, body)
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                evicted, _ = self._entries.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+        return entry
+
+
+class AsyncMenuCache(MenuCache):
+    """MenuCache for the ASGI app.
+
+    ``meta_collection`` is an async collection and ``build``/``load_ratings``
+    coroutine functions; concurrent misses on one key wait for a single rebuild.
+    Everything runs on one event loop, so only the awaits need locks.
+    """
+
+    def __init__(self, meta_collection, build, load_ratings=None, poll_interval=30.0, maxsize=128):
+        super().__init__(meta_collection, build, load_ratings, poll_interval, maxsize)
+        self._lock = nullcontext()
+        self._poll_lock = asyncio.Lock()
+
+    async def current_version(self):
+        now = time.monotonic()
+        if self._version is None or now - self._checked_at >= self.poll_interval:
+            if self._version is None or not self._poll_lock.locked():
+                async with self._poll_lock:
+                    if self._version is None or time.monotonic() - self._checked_at >= self.poll_interval:
+                        doc = await self.meta_collection.find_one({"_id": MENU_VERSION_ID}, {"version": 1})
+                        self._version = doc.get("version", 0) if doc else 0
+                        self._checked_at = time.monotonic()
+        return self._version
+
+    async def catalog_version(self):
+        if self._catalog_version is None or time.monotonic() - self._catalog_checked_at >= self.poll_interval:
+            doc = await self.meta_collection.find_one({"_id": CATALOG_VERSION_ID}, {"version": 1})
+            self._catalog_version = doc.get("version", 0) if doc else 0
+            self._catalog_checked_at = time.monotonic()
+        return self._catalog_version
+
+    async def refresh_ratings(self, force=False):
+        if self.load_ratings is None:
+            return
+        if not force and (time.monotonic() - self._ratings_checked_at < self.poll_interval or self._poll_lock.locked()):
+            return
+        async with self._poll_lock:
+            self._ratings_checked_at = time.monotonic()
+            titles = self._cached_titles()
+            self._apply_ratings(await self.load_ratings(titles) if titles else {})
+
+    async def get(self, **params):
+        key = tuple(sorted(params.items()))
+        version = await self.current_version()
+        await self.refresh_ratings()
+        key_lock = self._key_locks.setdefault(key, asyncio.Lock())
+        async with key_lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                result = await self.build(**params)
+                self._apply_ratings(built_ratings(result))
+                entry = self._store(key, version, result)
+            elif entry[1] != self._ratings_epoch:
+                entry = self._store(key, version, entry[2])
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            return entry[3], entry[4]
@@ -0,0 +1,192 @@
+"""In-process latency metrics rendered in the Prometheus text format.
+
+Tracks request latency per route and status, Mongo command latency per
+collection and command (through pymongo command monitoring), and Firebase
+token verification time. Each request also accumulates its own Mongo and
+Firebase time, so slow requests can be logged with a breakdown.
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Requests slower than this are logged with their timing breakdown
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 500))
+
+_registry = []
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {values[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class GaugeCallback:
+    """Gauges read from a callback returning ``{label value: number}`` at render time."""
+
+    def __init__(self, name, documentation, labelname, read):
+        self.name = name
+        self.documentation = documentation
+        self.labelname = labelname
+        self.read = read
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for value, number in sorted(self.read().items()):
+            lines.append(f"{self.name}{_format_labels((self.labelname,), (value,))} {number}")
+        return lines
+
+
+def render_metrics():
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Request latency by route, method and status.",
+    ("route", "method", "status"),
+)
+mongo_latency = Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency by collection and command.",
+    ("collection", "command", "outcome"), buckets=MONGO_BUCKETS,
+)
+firebase_latency = Histogram(
+    "firebase_verify_duration_seconds", "Firebase ID token verification latency (cache misses only).",
+    ("outcome",),
+)
+
+# Time spent in Mongo and Firebase by the current request, in milliseconds
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _add_request_time(name, seconds):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds * 1000
+
+
+def observe_firebase(seconds, outcome):
+    """Record one Firebase verification."""
+    firebase_latency.observe(seconds, outcome=outcome)
+    _add_request_time("firebase_ms", seconds)
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """pymongo command listener recording command latency per collection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections = {}  # (connection, request_id) -> collection name
+
+    @staticmethod
+    def _key(event):
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        command = event.command
+        collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+        with self._lock:
+            self._collections[self._key(event)] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, outcome):
+        with self._lock:
+            collection = self._collections.pop(self._key(event), "")
+        seconds = event.duration_micros / 1e6
+        mongo_latency.observe(seconds, collection=collection, command=event.command_name, outcome=outcome)
+        _add_request_time("mongo_ms", seconds)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+
+mongo_listener = MongoCommandTimer()
+
+
+def start_request(request_id=None):
+    """Start timing a request; returns its request id (generated if not given)."""
+    _request_timings.set({
+        "request_id": request_id or uuid.uuid4().hex,
+        "started": time.perf_counter(),
+    })
+    return _request_timings.get()["request_id"]
+
+
+def finish_request(route, method, status):
+    """Record the current request's latency and log it if it was slow."""
+    timings = _request_timings.get()
+    if timings is None:
+        return
+    _request_timings.set(None)
+    seconds = time.perf_counter() - timings["started"]
+    request_latency.observe(seconds, route=route, method=method, status=status)
+    total_ms = seconds * 1000
+    if total_ms >= SLOW_REQUEST_MS:
+        mongo_ms = timings.get("mongo_ms", 0.0)
+        firebase_ms = timings.get("firebase_ms", 0.0)
+        print(json.dumps({
+            "slow_request": True,
+            "request_id": timings["request_id"],
+            "route": route,
+            "method": method,
+            "status": status,
+            "total_ms": round(total_ms, 1),
+            "mongo_ms": round(mongo_ms, 1),
+            "firebase_ms": round(firebase_ms, 1),
+            "other_ms": round(total_ms - mongo_ms - firebase_ms, 1),
+        }))
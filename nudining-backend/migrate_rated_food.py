@@ -0,0 +1,38 @@
+"""One-off migration: move each user's ratedFood array into the ratings collection.
+
+The old array only recorded titles, so migrated ratings are stored with a null
+value; /api/rate treats a re-rate of one of those like the old average-based update.
+"""
+import os
+
+from pymongo import MongoClient, UpdateOne
+
+
+def migrate(collectionMisc, collectionRatings, batch_size=1000):
+    """Copy ratedFood titles into the ratings collection and drop the arrays."""
+    operations = []
+    migrated_users = 0
+    for user in collectionMisc.find({"ratedFood": {"$exists": True}}, {"uid": 1, "ratedFood": 1}):
+        for title in set(user.get("ratedFood") or []):
+            operations.append(UpdateOne(
+                {"uid": user["uid"], "title": title},
+                {"$setOnInsert": {"rating": None}},
+                upsert=True,
+            ))
+        if len(operations) >= batch_size:
+            collectionRatings.bulk_write(operations, ordered=False)
+            operations = []
+        migrated_users += 1
+    if operations:
+        collectionRatings.bulk_write(operations, ordered=False)
+
+    collectionMisc.update_many({"ratedFood": {"$exists": True}}, {"$unset": {"ratedFood": ""}})
+    return migrated_users
+
+
+if __name__ == '__main__':
+    client = MongoClient(os.environ.get("MONGOURI"))
+    db = client[os.environ.get("MONGODB_NAME")]
+    count = migrate(db[os.environ.get("MISC")], db[os.environ.get("RATINGS", "ratings")])
+    print(f"Migrated ratedFood for {count} users.")
+    client.close()
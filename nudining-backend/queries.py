@@ -0,0 +1,500 @@
+"""Mongo queries and request parsing shared by the Flask (app.py) and ASGI (asgi_app.py) servers."""
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from pymongo import UpdateOne
+
+# Fields returned for each menu item; missing fields come back as null
+MENU_ITEM_FIELDS = [
+    "title",
+    "dining_hall",
+    "meal_period",
+    "portion_size",
+    "nutritional_info",
+    "table_caption",
+    "rating",
+    "rating_count",
+    "labels",
+    "ingredients",
+]
+
+# Largest page a client can ask for with ?limit=
+MAX_PAGE_SIZE = 500
+
+# Macro name -> nutritional_info key it is computed from
+MACRO_SOURCES = {
+    "calories": "Calories",
+    "protein": "Protein (g)",
+    "carbs": "Total Carbohydrates (g)",
+    "fat": "Total Fat (g)",
+}
+
+
+def split_param(args, name):
+    """Read a comma-separated query parameter as a sorted tuple."""
+    return tuple(sorted({value.strip() for value in args.get(name, "").split(",") if value.strip()}))
+
+
+def menu_today():
+    """Today's date (YYYY-MM-DD) in HISTORY_TIMEZONE, the default menu date."""
+    return local_day(datetime.now(timezone.utc)).isoformat()
+
+
+def menu_params(args):
+    """Parse the menu endpoint's query parameters.
+
+    ``date`` (YYYY-MM-DD) defaults to today in HISTORY_TIMEZONE, so cached menus
+    roll over at local midnight. Raises ValueError with a client-facing message
+    for invalid values.
+    """
+    try:
+        menu_date = date.fromisoformat(args["date"]).isoformat() if args.get("date") else menu_today()
+    except ValueError:
+        raise ValueError("date must be formatted as YYYY-MM-DD")
+    fields = split_param(args, "fields") or tuple(MENU_ITEM_FIELDS)
+    if any(field not in MENU_ITEM_FIELDS for field in fields):
+        raise ValueError(f"fields must be a subset of {', '.join(MENU_ITEM_FIELDS)}")
+    limit = args.get("limit", type=int)
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return {
+        "dining_hall": args.get("dining_hall"),
+        "meal_period": args.get("meal_period"),
+        "labels": split_param(args, "labels"),
+        "exclude_labels": split_param(args, "exclude_labels"),
+        "fields": tuple(field for field in MENU_ITEM_FIELDS if field in fields),
+        "cursor": args.get("cursor"),
+        "limit": limit,
+        "date": menu_date,
+    }
+
+
+def menu_projection(fields, prefix=""):
+    """$project stage values for the requested menu fields (null when missing)."""
+    return {
+        "_id": 0,
+        **{field: {"$ifNull": [f"${prefix}{field}", None]} for field in fields},
+    }
+
+
+def menu_pipeline(food_collection, dining_hall=None, meal_period=None, labels=(), exclude_labels=(),
+                  fields=tuple(MENU_ITEM_FIELDS), cursor=None, limit=None):
+    """Build the aggregation for the current menu, run on todaysFood.
+
+    Today's titles (past ``cursor``, through todaysFood's title index) are joined
+    onto the food catalog and only then filtered, so a filtered page reads the
+    few hundred items on today's menu rather than scanning the catalog. Filtered
+    or paginated menus are sorted by title.
+    """
+    pipeline = []
+    if cursor:
+        pipeline.append({"$match": {"title": {"$gt": cursor}}})
+    pipeline += [
+        {"$group": {"_id": "$title"}},
+        {"$lookup": {
+            "from": food_collection,
+            "localField": "_id",
+            "foreignField": "title",
+            "as": "item",
+        }},
+        {"$unwind": "$item"},
+    ]
+    if not (dining_hall or meal_period or labels or exclude_labels or cursor or limit):
+        pipeline.append({"$project": menu_projection(fields, prefix="item.")})
+        return pipeline
+
+    match = {}
+    if dining_hall:
+        match["item.dining_hall"] = dining_hall
+    if meal_period:
+        match["item.meal_period"] = meal_period
+    if labels:
+        match["item.labels"] = {"$in": list(labels)}
+    if exclude_labels:
+        match.setdefault("item.labels", {})["$nin"] = list(exclude_labels)
+    if match:
+        pipeline.append({"$match": match})
+    pipeline.append({"$sort": {"_id": 1}})
+    if limit:
+        # One extra item tells us whether there is a next page
+        pipeline.append({"$limit": limit + 1})
+    pipeline.append({"$project": menu_projection(("title",) + tuple(f for f in fields if f != "title"), prefix="item.")})
+    return pipeline
+
+
+def daily_menu(items, ratings, dining_hall=None, meal_period=None, labels=(), exclude_labels=(), cursor=None,
+               limit=None, **_):
+    """Filter a precomputed per-date menu the way ``menu_pipeline`` filters the catalog.
+
+    ``items`` are the scraper's rows for the date, sorted by title; their ratings
+    come from ``ratings`` (``{title: food document}``), since those change after
+    the menu is published. Returns items for ``shape_menu``.
+    """
+    selected = []
+    for item in items:
+        item_labels = item.get("labels") or []
+        if dining_hall and item.get("dining_hall") != dining_hall:
+            continue
+        if meal_period and item.get("meal_period") != meal_period:
+            continue
+        if labels and not any(label in item_labels for label in labels):
+            continue
+        if exclude_labels and any(label in item_labels for label in exclude_labels):
+            continue
+        if cursor and item["title"] <= cursor:
+            continue
+        rated = ratings.get(item["title"]) or {}
+        selected.append({
+            **{field: item.get(field) for field in MENU_ITEM_FIELDS},
+            "rating": rated.get("rating"),
+            "rating_count": rated.get("rating_count"),
+        })
+        if limit and len(selected) > limit:
+            # One extra item tells us whether there is a next page
+            break
+    return selected
+
+
+def shape_menu(items, fields=tuple(MENU_ITEM_FIELDS), limit=None, **_):
+    """Trim aggregated items to the requested fields and page.
+
+    With ``limit`` the result is ``{"items": [...], "next_cursor": title or None}``.
+    """
+    if not limit:
+        return [{k: v for k, v in item.items() if k in fields} for item in items]
+    page = items[:limit]
+    return {
+        "items": [{k: v for k, v in item.items() if k in fields} for item in page],
+        "next_cursor": page[-1]["title"] if len(items) > limit else None,
+    }
+
+
+
+# Fields returned by search; ratings change without a new fingerprint, so they come from the menu instead
+SEARCH_FIELDS = [field for field in MENU_ITEM_FIELDS if field not in ("rating", "rating_count")]
+
+# Catalog fields read into the search index ("fingerprint" tells refreshes what changed)
+SEARCH_PROJECTION = {"_id": 0, "fingerprint": 1, **{field: 1 for field in SEARCH_FIELDS}}
+
+# Largest number of search results a client can ask for
+MAX_SEARCH_RESULTS = 100
+
+
+def search_params(args):
+    """Parse the search endpoint's ``q`` and ``limit`` parameters.
+
+    Raises ValueError with a client-facing message for invalid values.
+    """
+    query = args.get("q", "").strip()
+    if not query:
+        raise ValueError("q is required")
+    limit = args.get("limit", 20, type=int)
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        raise ValueError(f"limit must be between 1 and {MAX_SEARCH_RESULTS}")
+    return {"query": query, "limit": limit}
+
+
+def search_results(ranked):
+    """Shape ``(score, item)`` search hits with SEARCH_FIELDS (missing ones as null) plus their score."""
+    return [
+        {**{field: item.get(field) for field in SEARCH_FIELDS}, "score": round(score, 3)}
+        for score, item in ranked
+    ]
+
+
+# Menu fields the meal planner's nutrient matrix is built from
+PLANNER_FIELDS = ("title", "dining_hall", "meal_period", "nutritional_info", "labels")
+
+# Upper bounds for a meal plan request
+MAX_PLAN_ITEMS = 4
+MAX_PLAN_SERVINGS = 3
+MAX_PLANS = 10
+
+
+def plan_params(data):
+    """Parse a meal plan request body into MealPlanner.plan keyword arguments.
+
+    Raises ValueError with a client-facing message for invalid values.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("body must be a JSON object")
+    targets = data.get("targets")
+    if not isinstance(targets, dict) or not targets:
+        raise ValueError(f"targets must map some of {', '.join(MACRO_SOURCES)} to amounts")
+    for macro, amount in targets.items():
+        if macro not in MACRO_SOURCES or isinstance(amount, bool) or not isinstance(amount, (int, float)) or amount < 0:
+            raise ValueError(f"targets must map some of {', '.join(MACRO_SOURCES)} to amounts")
+    if not any(targets.values()):
+        raise ValueError("at least one target must be above zero")
+    labels = data.get("labels") or []
+    if not isinstance(labels, list) or not all(isinstance(label, str) for label in labels):
+        raise ValueError("labels must be a list of strings")
+
+    bounds = {"max_items": (3, MAX_PLAN_ITEMS), "max_servings": (1, MAX_PLAN_SERVINGS), "results": (5, MAX_PLANS)}
+    params = {}
+    for name, (default, upper) in bounds.items():
+        value = data.get(name, default)
+        if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= upper:
+            raise ValueError(f"{name} must be between 1 and {upper}")
+        params[name] = value
+    return {
+        "targets": targets,
+        "labels": tuple(labels),
+        "dining_hall": data.get("dining_hall"),
+        "meal_period": data.get("meal_period"),
+        **params,
+    }
+
+
+def bootstrap_body(menu_body, rated_food, user):
+    """Serialized /api/bootstrap response, embedding the menu cache's already-serialized body.
+
+    ``macros`` is null when the user does not exist yet.
+    """
+    macros = None if user is None else user.get("macros", dict.fromkeys(MACRO_SOURCES, 0))
+    return b"".join([
+        b'{"menu":', menu_body,
+        b',"ratedFood":', json.dumps(rated_food).encode("utf-8"),
+        b',"macros":', json.dumps(macros, separators=(",", ":")).encode("utf-8"),
+        b"}",
+    ])
+
+def macro_deltas(food_item, serving_size):
+    """Compute the macros contributed by ``serving_size`` servings of a food item.
+
+    ``nutritional_info`` holds typed ``{"value", "unit", "text"}`` amounts written by the scraper.
+    """
+    nutritional_info = food_item.get('nutritional_info') or {}
+    return {
+        macro: round((nutritional_info.get(source) or {}).get("value", 0) * serving_size)
+        for macro, source in MACRO_SOURCES.items()
+    }
+
+
+def meal_deltas(items):
+    """Sum the macro deltas of a list of ``{food_item, serving_size}`` entries.
+
+    Raises ValueError if an entry is not an object, is missing either field, or
+    has a non-numeric ``serving_size``.
+    """
+    deltas = dict.fromkeys(MACRO_SOURCES, 0)
+    for entry in items:
+        if not isinstance(entry, dict):
+            raise ValueError("Each item must be an object")
+        serving_size = entry.get('serving_size')
+        food_item = entry.get('food_item')
+        if not serving_size or not food_item:
+            raise ValueError("Missing required fields")
+        if isinstance(serving_size, bool) or not isinstance(serving_size, (int, float)):
+            raise ValueError("serving_size must be a number")
+        if not isinstance(food_item, dict):
+            raise ValueError("food_item must be an object")
+        for macro, delta in macro_deltas(food_item, serving_size).items():
+            deltas[macro] += delta
+    return deltas
+
+
+def macro_update(deltas):
+    """Pipeline update adding deltas to a user's macros, clamping each at zero."""
+    return [{"$set": {
+        f"macros.{macro}": {"$max": [0, {"$add": [{"$ifNull": [f"$macros.{macro}", 0]}, delta]}]}
+        for macro, delta in deltas.items()
+    }}]
+
+
+def rating_upsert(new_rating, pending=None):
+    """Update for the user's (uid, title) rating document.
+
+    ``pending`` holds extra fields to set, such as a write-behind ``pending`` tag.
+    """
+    return {"$set": {"rating": new_rating, **(pending or {})}, "$currentDate": {"updated_at": True}}
+
+
+def food_rating_update(previous, new_rating):
+    """Update for a food's rating/rating_count, given the user's previous rating document.
+
+    Every update also increments ``rating_version``, which orders leaderboard refreshes.
+    """
+    if previous is None:
+        # First rating from this user
+        return {"$inc": {"rating": new_rating, "rating_count": 1, "rating_version": 1}}
+    if previous.get("rating") is None:
+        # Migrated from ratedFood, where the original value was never stored,
+        # so replace an average rating instead
+        return [{"$set": {
+            "rating": {"$add": [
+                "$rating",
+                new_rating,
+                {"$multiply": [-1, {"$divide": ["$rating", {"$max": ["$rating_count", 1]}]}]},
+            ]},
+            "rating_version": {"$add": [{"$ifNull": ["$rating_version", 0]}, 1]},
+        }}]
+    return {"$inc": {"rating": new_rating - previous["rating"], "rating_version": 1}}
+
+
+def rating_deltas(previous, new_rating):
+    """``(rating delta, rating_count delta)`` of a vote, or None if it can't be written as an increment."""
+    if previous is None:
+        return new_rating, 1
+    if previous.get("rating") is None:
+        return None
+    return new_rating - previous["rating"], 0
+
+
+# Bayesian prior for leaderboard scores: every item starts as if it had
+# LEADERBOARD_PRIOR_WEIGHT ratings of LEADERBOARD_PRIOR_MEAN
+LEADERBOARD_PRIOR_MEAN = float(os.environ.get("LEADERBOARD_PRIOR_MEAN", 3))
+LEADERBOARD_PRIOR_WEIGHT = float(os.environ.get("LEADERBOARD_PRIOR_WEIGHT", 5))
+
+# Largest leaderboard a client can ask for
+MAX_LEADERBOARD_SIZE = 100
+
+
+def bayesian_score(rating_sum, rating_count):
+    """Average rating shrunk towards the prior mean, so items with few ratings can't top the board."""
+    return (LEADERBOARD_PRIOR_MEAN * LEADERBOARD_PRIOR_WEIGHT + rating_sum) / (LEADERBOARD_PRIOR_WEIGHT + rating_count)
+
+
+def bayesian_score_expr(sum_field, count_field):
+    """``bayesian_score`` as an aggregation expression over two document fields."""
+    return {"$divide": [
+        {"$add": [LEADERBOARD_PRIOR_MEAN * LEADERBOARD_PRIOR_WEIGHT, {"$ifNull": [sum_field, 0]}]},
+        {"$add": [LEADERBOARD_PRIOR_WEIGHT, {"$ifNull": [count_field, 0]}]},
+    ]}
+
+
+def leaderboard_entry(item):
+    """The leaderboard document for a catalog item (its ``rating`` field is the sum of ratings)."""
+    rating_sum = item.get("rating") or 0
+    rating_count = item.get("rating_count") or 0
+    return {
+        "title": item["title"],
+        "dining_hall": item.get("dining_hall"),
+        "meal_period": item.get("meal_period"),
+        "rating_count": rating_count,
+        "average": rating_sum / rating_count if rating_count else None,
+        "score": bayesian_score(rating_sum, rating_count),
+        "rating_version": item.get("rating_version", 0),
+    }
+
+
+def leaderboard_update(item):
+    """Upsert refreshing an item's leaderboard entry unless a newer rating already has.
+
+    On an existing, newer entry the filter misses and the upsert fails with a duplicate
+    key error on the unique title index, leaving the newer entry in place.
+    """
+    entry = leaderboard_entry(item)
+    return {"title": entry["title"], "rating_version": {"$lt": entry["rating_version"]}}, {"$set": entry}
+
+
+def leaderboard_params(args):
+    """Parse the leaderboard endpoint's ``dining_hall``, ``meal_period`` and ``limit`` parameters.
+
+    Raises ValueError with a client-facing message for invalid values.
+    """
+    dining_hall = args.get("dining_hall")
+    meal_period = args.get("meal_period")
+    if not dining_hall or not meal_period:
+        raise ValueError("dining_hall and meal_period are required")
+    limit = args.get("limit", 10, type=int)
+    if not 1 <= limit <= MAX_LEADERBOARD_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_LEADERBOARD_SIZE}")
+    return {"dining_hall": dining_hall, "meal_period": meal_period, "limit": limit}
+
+
+# Longest date range (in days) the history endpoint returns
+MAX_HISTORY_DAYS = 366
+
+# Timezone whose calendar days (and Monday-start weeks) macro history is bucketed by
+HISTORY_TIMEZONE = ZoneInfo(os.environ.get("HISTORY_TIMEZONE", "America/New_York"))
+
+
+def week_start(day):
+    """Monday of the week containing ``day``."""
+    return day - timedelta(days=day.weekday())
+
+
+def local_day(moment):
+    """The calendar day of a timezone-aware datetime in HISTORY_TIMEZONE."""
+    return moment.astimezone(HISTORY_TIMEZONE).date()
+
+
+def history_entries(items, logged_at):
+    """Logged ``{food_item, serving_size}`` items as stored in a user's daily history bucket."""
+    return [
+        {
+            "title": entry["food_item"].get("title"),
+            "serving_size": entry["serving_size"],
+            "macros": macro_deltas(entry["food_item"], entry["serving_size"]),
+            "logged_at": logged_at,
+        }
+        for entry in items
+    ]
+
+
+def history_updates(uid, day, entries, deltas):
+    """Upserts appending entries to the user's day bucket and adding deltas to its day and week rollups.
+
+    Each day bucket holds that day's entries and totals; week documents hold totals only.
+    """
+    increments = {f"macros.{macro}": delta for macro, delta in deltas.items()}
+    increments["items"] = len(entries)
+    return [
+        UpdateOne(
+            {"uid": uid, "period": "day", "start": day.isoformat()},
+            {"$push": {"entries": {"$each": entries}}, "$inc": increments},
+            upsert=True,
+        ),
+        UpdateOne(
+            {"uid": uid, "period": "week", "start": week_start(day).isoformat()},
+            {"$inc": increments},
+            upsert=True,
+        ),
+    ]
+
+
+def failed_upserts(error, operations):
+    """Operations of an unordered bulk write that lost an upsert race (duplicate key) and can be re-applied.
+
+    Re-raises the error if anything else failed.
+    """
+    write_errors = error.details.get("writeErrors", [])
+    if any(write_error.get("code") != 11000 for write_error in write_errors):
+        raise error
+    return [operations[write_error["index"]] for write_error in write_errors]
+
+
+def history_params(args, today):
+    """Parse the history endpoint's ``period``, ``start``, ``end`` and ``entries`` parameters.
+
+    Defaults to the last 7 days. Raises ValueError with a client-facing message.
+    """
+    period = args.get("period", "day")
+    if period not in ("day", "week"):
+        raise ValueError("period must be day or week")
+    try:
+        end = date.fromisoformat(args["end"]) if args.get("end") else today
+        start = date.fromisoformat(args["start"]) if args.get("start") else end - timedelta(days=6)
+    except ValueError:
+        raise ValueError("start and end must be YYYY-MM-DD dates")
+    if start > end or (end - start).days >= MAX_HISTORY_DAYS:
+        raise ValueError(f"start must be on or before end, at most {MAX_HISTORY_DAYS} days apart")
+    if period == "week":
+        start = week_start(start)
+    return {
+        "period": period,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "entries": period == "day" and args.get("entries", "").lower() in ("1", "true", "yes"),
+    }
+
+
+def history_query(uid, period, start, end, entries=False):
+    """``find`` filter and projection for a user's rollups in a date range (served by the uid/period/start index)."""
+    projection = {"_id": 0, "start": 1, "macros": 1, "items": 1}
+    if entries:
+        projection["entries"] = 1
+    return {"uid": uid, "period": period, "start": {"$gte": start, "$lte": end}}, projection
@@ -0,0 +1,269 @@
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument, UpdateOne
+
+from queries import food_rating_update
+
+# Generations remembered on each food document, so a retried flush doesn't apply twice
+MAX_RATING_BATCHES = 32
+
+# A pending tag this old belongs to a generation whose process died before flushing it
+STALE_PENDING_SECONDS = 300
+
+
+def title_totals(collectionRatings, titles):
+    """``{title: total}`` of each title's rating sum, count and ratings with no stored value."""
+    return {
+        total["_id"]: total
+        for total in collectionRatings.aggregate([
+            {"$match": {"title": {"$in": list(titles)}}},
+            {"$group": {
+                "_id": "$title",
+                "sum": {"$sum": "$rating"},
+                "count": {"$sum": 1},
+                "unknown": {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$rating", None]}, None]}, 1, 0]}},
+            }},
+        ])
+    }
+
+
+def recompute_update(total, offset=(0, 0)):
+    """Pipeline update setting a food's rating/rating_count from ``title_totals``, less ``offset``.
+
+    ``offset`` is ``(rating, rating_count)`` still buffered for the title, which its
+    flush will add. Ratings migrated from ratedFood have no stored value, so they
+    count at the item's current average.
+    """
+    return [{"$set": {
+        "rating": {"$add": [
+            total["sum"] - offset[0],
+            {"$multiply": [
+                total["unknown"],
+                {"$divide": [{"$ifNull": ["$rating", 0]}, {"$max": [{"$ifNull": ["$rating_count", 0]}, 1]}]},
+            ]},
+        ]},
+        "rating_count": total["count"] - offset[1],
+        "rating_version": {"$add": [{"$ifNull": ["$rating_version", 0]}, 1]},
+    }}]
+
+
+def pending_age(doc):
+    """Seconds since a rating document was tagged ``pending``."""
+    tagged_at = doc["pending_at"]
+    if tagged_at.tzinfo is None:
+        tagged_at = tagged_at.replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - tagged_at).total_seconds()
+
+
+class RatingWriteBehind:
+    """Write-behind buffer for food rating aggregates.
+
+    Each user's vote is still written to the ratings collection before /api/rate
+    responds, tagged with the buffer's current ``pending`` generation. Only the
+    food documents' ``rating``/``rating_count`` increments are held in memory,
+    coalesced per title (so repeated votes by the same user collapse into one
+    net increment), and written with one bulk write every ``flush_interval``
+    seconds, or sooner once ``max_titles`` titles are waiting.
+
+    A flush swaps in a new generation, waits for votes still in flight in the
+    old one, applies its increments, then clears that generation's ``pending``
+    tags; a failed flush is retried by the next one. If the process dies first, the tags stay behind and
+    reconcile_ratings.py recomputes those titles from the ratings collection.
+    A re-rate of a vote still tagged by another generation is applied
+    synchronously (see ``settle``) so it can't hide that generation's increment.
+    """
+
+    def __init__(self, collection, collectionRatings, on_flush=None, flush_interval=5.0, max_titles=500):
+        self.collection = collection
+        self.collectionRatings = collectionRatings
+        self.on_flush = on_flush
+        self.flush_interval = flush_interval
+        self.max_titles = max_titles
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._generation = uuid.uuid4().hex
+        self._deltas = {}  # title -> [rating delta, rating_count delta]
+        self._flushing = {}  # the generation being flushed, for read-your-writes
+        self._flushing_generation = None
+        self._failed = []  # [(generation, deltas)] whose flush failed, retried by the next one
+        self._inflight = {}  # generation -> votes started but not yet added
+
+    def start(self):
+        """Start the background flush thread."""
+        self._thread = threading.Thread(target=self._run, name="rating-write-behind", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if not self._stopping:
+                self.flush()
+
+    @contextmanager
+    def vote(self):
+        """Context for one /api/rate call; yields ``(generation, add)``.
+
+        Tag the user's rating document with ``generation`` and call
+        ``add(title, rating_delta, count_delta)`` once the vote is known to apply.
+        """
+        with self._cond:
+            generation = self._generation
+            self._inflight[generation] = self._inflight.get(generation, 0) + 1
+
+        def add(title, rating_delta, count_delta):
+            with self._cond:
+                deltas = self._deltas if generation == self._generation else self._flushing
+                entry = deltas.setdefault(title, [0, 0])
+                entry[0] += rating_delta
+                entry[1] += count_delta
+                if len(self._deltas) >= self.max_titles:
+                    self._wake.set()
+
+        try:
+            yield generation, add
+        finally:
+            with self._cond:
+                self._inflight[generation] -= 1
+                self._cond.notify_all()
+
+    def owns(self, generation):
+        """True if ``generation`` is buffered here, so its increments are still to be written."""
+        with self._cond:
+            return generation in (self._generation, self._flushing_generation) or any(
+                batch == generation for batch, _ in self._failed
+            )
+
+    def foreign(self, previous):
+        """True if a user's previous rating document is still pending in a generation this buffer doesn't own."""
+        return previous is not None and previous.get("pending") is not None and not self.owns(previous["pending"])
+
+    def settle(self, uid, title, previous, new_rating):
+        """Apply a re-rate synchronously when ``previous`` is still pending elsewhere; returns the food document.
+
+        A stale tag means its process died with the previous vote unwritten, so the
+        title is recomputed from the ratings collection (less what this buffer still
+        holds for it) and the stale tags are cleared. A recent tag's owner is assumed
+        alive: its tag is put back so the owner's flush (or reconcile_ratings.py)
+        still accounts for it, and only this vote's difference is applied.
+        """
+        if pending_age(previous) >= STALE_PENDING_SECONDS:
+            item = self.collection.find_one({"title": title}, {"rating_batches": 1})
+            total = title_totals(self.collectionRatings, [title]).get(title)
+            if item is None or total is None:
+                return None
+            updated_item = self.collection.find_one_and_update(
+                {"title": title},
+                recompute_update(total, self.pending(title, item.get("rating_batches", ()))),
+                return_document=ReturnDocument.AFTER,
+            )
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=STALE_PENDING_SECONDS)
+            self.collectionRatings.update_many(
+                {"title": title, "pending_at": {"$lt": cutoff}},
+                {"$unset": {"pending": "", "pending_at": ""}},
+            )
+            return updated_item
+
+        self.collectionRatings.update_one(
+            {"uid": uid, "title": title},
+            {"$set": {"pending": previous["pending"], "pending_at": previous["pending_at"]}},
+        )
+        return self.collection.find_one_and_update(
+            {"title": title},
+            food_rating_update(previous, new_rating),
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def pending(self, title, applied=()):
+        """``(rating delta, rating_count delta)`` not yet written for a title.
+
+        ``applied`` is the food document's ``rating_batches``; failed batches it
+        lists already reached that document.
+        """
+        with self._cond:
+            buffered = [self._deltas, self._flushing] + [
+                deltas for batch, deltas in self._failed if batch not in applied
+            ]
+            entries = [deltas.get(title, (0, 0)) for deltas in buffered]
+            return sum(entry[0] for entry in entries), sum(entry[1] for entry in entries)
+
+    def flush(self):
+        """Write the buffered increments, retrying earlier failed batches; returns the titles updated.
+
+        Each generation's increments are written at most once per food document:
+        the update records the generation in ``rating_batches``, so retrying a
+        batch that was partly applied before an error skips the titles it reached.
+        On any error the batches and their ``pending`` tags are kept for the next flush.
+        """
+        with self._flush_lock:
+            with self._cond:
+                generation = self._generation
+                self._generation = uuid.uuid4().hex
+                self._flushing_generation = generation
+                self._flushing, self._deltas = self._deltas, {}
+                while self._inflight.get(generation):
+                    self._cond.wait()
+                voted = self._inflight.pop(generation, None) is not None
+                batches = self._failed + ([(generation, dict(self._flushing))] if voted else [])
+
+            if not batches:
+                with self._cond:
+                    self._flushing_generation = None
+                return []
+            try:
+                operations = [
+                    UpdateOne(
+                        {"title": title, "rating_batches": {"$ne": batch}},
+                        {
+                            "$inc": {"rating": rating, "rating_count": count, "rating_version": 1},
+                            "$push": {"rating_batches": {"$each": [batch], "$slice": -MAX_RATING_BATCHES}},
+                        },
+                    )
+                    for batch, deltas in batches
+                    for title, (rating, count) in deltas.items()
+                ]
+                if operations:
+                    self.collection.bulk_write(operations, ordered=False)
+                self.collectionRatings.update_many(
+                    {"pending": {"$in": [batch for batch, _ in batches]}},
+                    {"$unset": {"pending": "", "pending_at": ""}},
+                )
+                failed = []
+            except Exception as e:
+                print(f"Rating flush failed, retrying {len(batches)} batches with the next flush: {e}")
+                failed = batches
+            with self._cond:
+                self._failed = failed
+                self._flushing = {}
+                self._flushing_generation = None
+            if failed:
+                return []
+
+        titles = sorted({title for _, deltas in batches for title in deltas})
+        if titles:
+            print(f"Flushed rating increments for {len(titles)} titles.")
+            if self.on_flush:
+                try:
+                    self.on_flush(titles)
+                except Exception as e:
+                    print(f"Error after rating flush: {e}")
+        return titles
+
+    def close(self):
+        """Stop the flush thread and write whatever is still buffered."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+def pending_marker(generation):
+    """Fields tagging a user's rating document as not yet reflected in the food aggregate."""
+    return {"pending": generation, "pending_at": datetime.now(timezone.utc)}
@@ -0,0 +1,55 @@
+"""Recompute food rating aggregates left behind by a crashed write-behind buffer.
+
+With RATING_WRITE_BEHIND=1 each user's rating document is tagged ``pending``
+until its increment reaches the food document. Tags older than ``--older-than``
+seconds (well past RATING_FLUSH_SECONDS) belong to a flush that never finished,
+so their titles' ``rating``/``rating_count`` are rebuilt from the ratings
+collection. Run it while no other API process is buffering votes for the same
+titles, e.g. before starting the server after a crash.
+"""
+import argparse
+import os
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, MongoClient, UpdateOne
+
+from build_leaderboard import build_leaderboard
+from indexes import ensure_indexes
+from rating_buffer import STALE_PENDING_SECONDS, recompute_update, title_totals
+
+
+def reconcile_ratings(collection, collectionRatings, older_than=STALE_PENDING_SECONDS):
+    """Rebuild the aggregates of titles with stale ``pending`` ratings; returns those titles."""
+    ensure_indexes([(collectionRatings, [("title", ASCENDING)], {})])
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=older_than)
+    stale = {"pending": {"$exists": True}, "pending_at": {"$lt": cutoff}}
+    titles = collectionRatings.distinct("title", stale)
+    if not titles:
+        return []
+
+    operations = [
+        UpdateOne({"title": title}, recompute_update(total))
+        for title, total in title_totals(collectionRatings, titles).items()
+    ]
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+    collectionRatings.update_many(
+        {"title": {"$in": titles}, **stale},
+        {"$unset": {"pending": "", "pending_at": ""}},
+    )
+    return titles
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Recompute rating aggregates after a write-behind crash.")
+    parser.add_argument("--older-than", type=int, default=STALE_PENDING_SECONDS, help="seconds before a pending rating counts as stale")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ.get("MONGOURI"))
+    db = client[os.environ.get("MONGODB_NAME")]
+    collection = db[os.environ.get("MONGO_COLLECTION_NAME")]
+    titles = reconcile_ratings(collection, db[os.environ.get("RATINGS", "ratings")], args.older_than)
+    print(f"Reconciled {len(titles)} titles.")
+    if titles:
+        build_leaderboard(collection, db[os.environ.get("LEADERBOARD", "leaderboard")])
+    client.close()
@@ -0,0 +1,159 @@
+import bisect
+import re
+import threading
+
+# How much a match in each field counts towards an item's score
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "labels": 2.0,
+    "table_caption": 1.5,
+    "ingredients": 1.0,
+}
+
+# Score multipliers for each kind of term match
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.8
+TYPO_MATCH = 0.6
+
+# Shortest query token matched by prefix, and by a one-edit typo
+MIN_PREFIX_LENGTH = 2
+MIN_TYPO_LENGTH = 4
+
+# Most terms a single prefix may expand to
+MAX_PREFIX_TERMS = 64
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lowercase alphanumeric tokens of a string."""
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def one_deletes(term):
+    """Every string made by deleting one character of ``term``."""
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def item_terms(item):
+    """``{term: weight}`` for an item, keeping each term's best field weight."""
+    terms = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = item.get(field)
+        text = " ".join(value) if isinstance(value, list) else value
+        for term in tokenize(text if isinstance(text, str) else None):
+            terms[term] = max(terms.get(term, 0.0), weight)
+    return terms
+
+
+class SearchIndex:
+    """In-memory inverted index over the food catalog with prefix and typo-tolerant matching.
+
+    Items are keyed by title and indexed by their title, labels, table caption
+    and ingredients. ``stale`` compares catalog fingerprints against the indexed
+    ones so a refresh only re-reads new or changed items; ``update`` applies them.
+    Typos are matched through a one-deletion neighbourhood of every term, which
+    catches a single substituted, inserted, deleted or transposed character.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}  # title -> (fingerprint, item)
+        self._item_terms = {}  # title -> {term: weight}
+        self._postings = {}  # term -> {title: weight}
+        self._terms = []  # sorted, for prefix lookups
+        self._deletes = {}  # term with one character deleted -> set of terms
+        self.version = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def stale(self, fingerprints):
+        """Given the catalog's ``{title: fingerprint}``, return ``(changed titles, removed titles)``."""
+        with self._lock:
+            changed = [
+                title for title, fingerprint in fingerprints.items()
+                if title not in self._items or self._items[title][0] != fingerprint
+            ]
+            removed = [title for title in self._items if title not in fingerprints]
+        return changed, removed
+
+    def update(self, items, removed=(), version=None):
+        """Index new or changed items (each with its ``fingerprint``) and drop removed titles."""
+        with self._lock:
+            for title in removed:
+                self._remove(title)
+            for item in items:
+                title = item["title"]
+                self._remove(title)
+                terms = item_terms(item)
+                self._items[title] = (item.get("fingerprint"), {k: v for k, v in item.items() if k != "fingerprint"})
+                self._item_terms[title] = terms
+                for term, weight in terms.items():
+                    if term not in self._postings:
+                        self._postings[term] = {}
+                        bisect.insort(self._terms, term)
+                        for deleted in one_deletes(term):
+                            self._deletes.setdefault(deleted, set()).add(term)
+                    self._postings[term][title] = weight
+            if version is not None:
+                self.version = version
+
+    def _remove(self, title):
+        if title not in self._items:
+            return
+        del self._items[title]
+        for term in self._item_terms.pop(title):
+            postings = self._postings[term]
+            postings.pop(title, None)
+            if postings:
+                continue
+            del self._postings[term]
+            del self._terms[bisect.bisect_left(self._terms, term)]
+            for deleted in one_deletes(term):
+                terms = self._deletes[deleted]
+                terms.discard(term)
+                if not terms:
+                    del self._deletes[deleted]
+
+    def _matches(self, token):
+        """``{term: quality}`` of indexed terms matching one query token."""
+        matches = {}
+        if len(token) >= MIN_TYPO_LENGTH:
+            candidates = set(self._deletes.get(token, ()))
+            for deleted in one_deletes(token):
+                if deleted in self._postings:
+                    candidates.add(deleted)
+                candidates |= self._deletes.get(deleted, set())
+            for term in candidates:
+                matches[term] = TYPO_MATCH
+        if len(token) >= MIN_PREFIX_LENGTH:
+            start = bisect.bisect_left(self._terms, token)
+            for term in self._terms[start:start + MAX_PREFIX_TERMS]:
+                if not term.startswith(token):
+                    break
+                matches[term] = PREFIX_MATCH
+        if token in self._postings:
+            matches[token] = EXACT_MATCH
+        return matches
+
+    def search(self, query, limit=20):
+        """Items matching every query token, best first, as ``(score, item)`` pairs."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        with self._lock:
+            scores = None
+            for token in tokens:
+                token_scores = {}
+                for term, quality in self._matches(token).items():
+                    for title, weight in self._postings[term].items():
+                        token_scores[title] = max(token_scores.get(title, 0.0), quality * weight)
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {title: score + token_scores[title] for title, score in scores.items() if title in token_scores}
+                if not scores:
+                    return []
+            ranked = sorted(scores.items(), key=lambda entry: (-entry[1], entry[0]))[:limit]
+            return [(score, self._items[title][1]) for title, score in ranked]
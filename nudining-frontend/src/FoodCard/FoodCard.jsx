@@ -73,12 +73,7 @@ const FoodCard = React.forwardRef(({ className, foodItem, updateRating, ratedFoo
     setShowInput(!showInput);
   };
 
-  let labelsArray = [];
-  try {
-    labelsArray = JSON.parse(foodItem.labels || '[]');
-  } catch (error) {
-    console.error("Error parsing labels:", error);
-  }
+  const labelsArray = foodItem.labels || [];
 
   const isVegetarian = labelsArray.includes("vegan");
   const hasGluten = labelsArray.includes("gluten");
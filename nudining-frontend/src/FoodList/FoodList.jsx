@@ -3,19 +3,18 @@ import FoodCard from "../FoodCard/FoodCard";
 import { getAuth } from "firebase/auth";
 import { gsap } from 'gsap';
 
-function FoodList({ Station, MealPeriod, DiningHall, fetchUserMacros, activeFilters }) {
-  const [foodList, setFoodItems] = useState([]);
-  const [ratedFood, setRatedFood] = useState([]);
+// foodItems and ratedFood come from the page's single /api/bootstrap request (see Home.jsx)
+function FoodList({ Station, MealPeriod, DiningHall, fetchUserMacros, activeFilters, foodItems, ratedFood, onRated }) {
   const [cardsRendered, setCardsRendered] = useState(false);
   const foodCardRefs = useRef({}); // Using an object to map unique titles to refs
 
   const getFilteredFoodItems = () => {
-    let filteredItems = foodList;
+    let filteredItems = foodItems || [];
 
     if (activeFilters && activeFilters.length > 0) {
       if (activeFilters.includes('gluten')) {
         filteredItems = filteredItems.filter(
-          (item) => !JSON.parse(item.labels || '[]').includes('gluten')
+          (item) => !(item.labels || []).includes('gluten')
         );
       }
 
@@ -23,7 +22,7 @@ function FoodList({ Station, MealPeriod, DiningHall, fetchUserMacros, activeFilt
       if (includeFilters.length > 0) {
         filteredItems = filteredItems.filter((item) =>
           includeFilters.some((filter) =>
-            JSON.parse(item.labels || '[]').includes(filter)
+            (item.labels || []).includes(filter)
           )
         );
       }
@@ -34,13 +33,6 @@ function FoodList({ Station, MealPeriod, DiningHall, fetchUserMacros, activeFilt
 
   const filteredFoodItems = getFilteredFoodItems();
 
-  // Fetch food items and rated food on component mount
-  useEffect(() => {
-    fetchUpdatedFoodItems();
-    fetchUserRatedFood();
-    // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, []);
-
   // Set cardsRendered to true once all food cards are created
   useEffect(() => {
     if (filteredFoodItems.length > 0) {
@@ -71,55 +63,6 @@ function FoodList({ Station, MealPeriod, DiningHall, fetchUserMacros, activeFilt
     }
   }, [cardsRendered]);
 
-  const fetchUpdatedFoodItems = async () => {
-    const user = getAuth().currentUser;
-    if (user) {
-      try {
-        const idToken = await user.getIdToken();
-        const response = await fetch(import.meta.env.VITE_FETCH_UPDATED_FOOD_ITEMS_URL, {
-          headers: {
-            'Content-Type': 'application/json',
-            Authorization: `Bearer ${idToken}`,
-          },
-        });
-        if (!response.ok) {
-          throw new Error("Failed to fetch food items");
-        }
-        const data = await response.json();
-        setFoodItems(data);
-      } catch (error) {
-        console.error("Error fetching food items:", error);
-      }
-    } else {
-      console.error("User is not authenticated");
-    }
-  };
-
-  const fetchUserRatedFood = async () => {
-    const user = getAuth().currentUser;
-    if (user) {
-      try {
-        const idToken = await user.getIdToken();
-        const response = await fetch(import.meta.env.VITE_FETCH_USER_RATED_FOOD_URL, {
-          method: 'GET',
-          headers: {
-            'Content-Type': 'application/json',
-            Authorization: `Bearer ${idToken}`,
-          },
-        });
-        if (!response.ok) {
-          throw new Error("Failed to fetch user-rated food");
-        }
-        const data = await response.json();
-        setRatedFood(data.ratedFood);
-      } catch (error) {
-        console.error("Error fetching user-rated food:", error);
-      }
-    } else {
-      console.error("User is not authenticated");
-    }
-  };
-
   const updateRating = async (title, newRating) => {
     const user = getAuth().currentUser;
     if (user) {
@@ -141,12 +84,7 @@ function FoodList({ Station, MealPeriod, DiningHall, fetchUserMacros, activeFilt
           throw new Error('Failed to update rating');
         }
         const updatedItem = await response.json();
-        setFoodItems(prevItems =>
-          prevItems.map(item =>
-            item.title === updatedItem.title ? updatedItem : item
-          )
-        );
-        setRatedFood(prevRatedFood => [...prevRatedFood, title]);
+        onRated(updatedItem);
         return updatedItem;
       } catch (error) {
         console.error("Error updating rating:", error);
@@ -176,7 +114,7 @@ function FoodList({ Station, MealPeriod, DiningHall, fetchUserMacros, activeFilt
               }}
               foodItem={food}
               updateRating={updateRating}
-              ratedFood={ratedFood}
+              ratedFood={ratedFood || []}
               fetchUserMacros={fetchUserMacros}
             />
           ))}
@@ -1,6 +1,7 @@
 import React from 'react';
 function MacroTable({macros}) {
-    const macroEntries = JSON.parse(macros);
+    // Each entry is a typed amount: { value, unit, text }
+    const macroEntries = macros || {};
 
 
 
@@ -9,7 +10,7 @@ function MacroTable({macros}) {
     <ul>
         {Object.keys(macroEntries).map((key) => (
             <li key={key}>
-                {key}: {macroEntries[key]}
+                {key}: {macroEntries[key].text}
             </li>
             )
         )}
@@ -17,4 +18,4 @@ function MacroTable({macros}) {
   );
 }
 
-export default MacroTable;
+export default MacroTable;
\ No newline at end of file
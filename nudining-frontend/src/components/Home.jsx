@@ -1,9 +1,9 @@
 import React, { useEffect, useState, useRef } from 'react';
 import { getAuth } from 'firebase/auth';
-import Steast from "./Steast";
+import Steast, { diningHall as steastDiningHall } from "./Steast";
 import { gsap } from 'gsap';
 import { doSignOut } from "../firebase/auth";
-import IV from "./IV";
+import IV, { diningHall as ivDiningHall } from "./IV";
 import { useNavigate } from 'react-router-dom';
 import Joyride from 'react-joyride';
 
@@ -11,6 +11,8 @@ function Home() {
   const [macros, setMacros] = useState({ calories: 0, protein: 0, carbs: 0, fat: 0 });
   const [showMacros, setShowMacros] = useState(false);
   const [selectedComponent, setSelectedComponent] = useState("Steast");
+  const [menu, setMenu] = useState([]);
+  const [ratedFood, setRatedFood] = useState([]);
   const [runTutorial, setRunTutorial] = useState(false);
   const macrosRef = useRef(null);
   const navigate = useNavigate();
@@ -21,6 +23,53 @@ function Home() {
     }
   }, [showMacros]);
 
+  // Menu, rated food and macros for the selected dining hall come back from a single request
+  useEffect(() => {
+    fetchBootstrap(selectedComponent === "Steast" ? steastDiningHall : ivDiningHall);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [selectedComponent]);
+
+  const fetchBootstrap = async (diningHall) => {
+    const user = getAuth().currentUser;
+    if (!user) {
+      console.error("User is not authenticated");
+      return;
+    }
+
+    try {
+      const idToken = await user.getIdToken();
+      // Only this dining hall's items; meal periods are still switched on the client
+      const url = `${import.meta.env.VITE_FETCH_BOOTSTRAP_URL}?dining_hall=${encodeURIComponent(diningHall)}`;
+      const response = await fetch(url, {
+        headers: {
+          'Content-Type': 'application/json',
+          Authorization: `Bearer ${idToken}`
+        }
+      });
+
+      if (!response.ok) {
+        throw new Error("Failed to fetch food items");
+      }
+
+      const data = await response.json();
+      setMenu(data.menu);
+      setRatedFood(data.ratedFood);
+      setMacros(data.macros || { calories: 0, protein: 0, carbs: 0, fat: 0 });
+    } catch (error) {
+      console.error("Error fetching food items:", error);
+    }
+  };
+
+  // Replace a rated item with the server's copy and remember the user rated it
+  const handleRated = (updatedItem) => {
+    setMenu(prevItems =>
+      prevItems.map(item =>
+        item.title === updatedItem.title ? updatedItem : item
+      )
+    );
+    setRatedFood(prevRatedFood => [...prevRatedFood, updatedItem.title]);
+  };
+
   const fetchUserMacros = async () => {
     const user = getAuth().currentUser;
 
@@ -82,9 +131,9 @@ function Home() {
     }
   };
 
+  // Macros arrive with the bootstrap and are refreshed whenever a food card logs a meal
   const handleMacroClick = () => {
     setShowMacros(!showMacros);
-    fetchUserMacros();
   };
 
   const handleLogout = () => {
@@ -206,9 +255,9 @@ function Home() {
       </div>
       <div>
         {selectedComponent === "Steast" ? (
-          <Steast fetchUserMacros={fetchUserMacros} />
+          <Steast fetchUserMacros={fetchUserMacros} menu={menu} ratedFood={ratedFood} onRated={handleRated} />
         ) : (
-          <IV fetchUserMacros={fetchUserMacros} />
+          <IV fetchUserMacros={fetchUserMacros} menu={menu} ratedFood={ratedFood} onRated={handleRated} />
         )}
         <button
           className="macro-calculator-button absolute top-4 left-4 bg-gray-700 text-white py-2 px-4 rounded hover:bg-blue-600 transition duration-300 ease-in-out transform hover:scale-105"
@@ -4,9 +4,9 @@ import { doSignOut } from '../firebase/auth';
 import FoodList from "../FoodList/FoodList";
 import Navbar from "./Navbar";
 
-const diningHall = "The Eatery at Stetson East";
+export const diningHall = "The Eatery at Stetson East";
 
-function Steast({ fetchUserMacros }) {
+function Steast({ fetchUserMacros, menu, ratedFood, onRated }) {
   const [mealPeriod, setMealPeriod] = useState("Breakfast");
   const [activeFilters, setActiveFilters] = useState([]);
   const navigate = useNavigate();
@@ -34,6 +34,9 @@ function Steast({ fetchUserMacros }) {
           fetchUserMacros={fetchUserMacros}
           DiningHall={diningHall}
           activeFilters={activeFilters}
+          foodItems={menu}
+          ratedFood={ratedFood}
+          onRated={onRated}
         />
       ) : (
         <>
@@ -43,6 +46,9 @@ function Steast({ fetchUserMacros }) {
             fetchUserMacros={fetchUserMacros}
             DiningHall={diningHall}
             activeFilters={activeFilters}
+            foodItems={menu}
+            ratedFood={ratedFood}
+            onRated={onRated}
           />
           <FoodList
             Station={"RICE STATION"}
@@ -50,6 +56,9 @@ function Steast({ fetchUserMacros }) {
             fetchUserMacros={fetchUserMacros}
             DiningHall={diningHall}
             activeFilters={activeFilters}
+            foodItems={menu}
+            ratedFood={ratedFood}
+            onRated={onRated}
           />
           <FoodList
             Station={"HOMESTYLE"}
@@ -57,6 +66,9 @@ function Steast({ fetchUserMacros }) {
             fetchUserMacros={fetchUserMacros}
             DiningHall={diningHall}
             activeFilters={activeFilters}
+            foodItems={menu}
+            ratedFood={ratedFood}
+            onRated={onRated}
           />
           <FoodList
             Station={"MENUTAINMENT"}
@@ -64,6 +76,9 @@ function Steast({ fetchUserMacros }) {
             fetchUserMacros={fetchUserMacros}
             DiningHall={diningHall}
             activeFilters={activeFilters}
+            foodItems={menu}
+            ratedFood={ratedFood}
+            onRated={onRated}
           />
           <FoodList
             Station={"SOUP"}
@@ -71,6 +86,9 @@ function Steast({ fetchUserMacros }) {
             fetchUserMacros={fetchUserMacros}
             DiningHall={diningHall}
             activeFilters={activeFilters}
+            foodItems={menu}
+            ratedFood={ratedFood}
+            onRated={onRated}
           />
           <FoodList
             Station={"FRESH 52 B"}
@@ -78,6 +96,9 @@ function Steast({ fetchUserMacros }) {
             fetchUserMacros={fetchUserMacros}
             DiningHall={diningHall}
             activeFilters={activeFilters}
+            foodItems={menu}
+            ratedFood={ratedFood}
+            onRated={onRated}
           />
           <FoodList
             Station={"SWEET SHOPPE"}
@@ -85,6 +106,9 @@ function Steast({ fetchUserMacros }) {
             fetchUserMacros={fetchUserMacros}
             DiningHall={diningHall}
             activeFilters={activeFilters}
+            foodItems={menu}
+            ratedFood={ratedFood}
+            onRated={onRated}
           />
         </>
       )}
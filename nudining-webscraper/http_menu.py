@@ -0,0 +1,126 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from nutrition import normalize_nutrition, normalize_labels
+
+# Menu API behind nudining.com's "What's on the menu" page
+DEFAULT_API_URL = "https://api.dineoncampus.com/v1"
+
+# Define valid meal periods
+VALID_MEAL_PERIODS = ["Breakfast", "Lunch", "Dinner", "Everyday"]
+
+# Keywords in the API's filter names and the labels the frontend understands
+LABEL_KEYWORDS = {"vegetarian": "vegan", "vegan": "vegan", "gluten": "gluten", "protein": "protein"}
+
+
+def fixture_name(path, params):
+    """File name a response is recorded under, e.g. ``location_123_periods__date-2024-12-07.json``."""
+    name = path.strip("/").replace("/", "_")
+    query = "_".join(f"{key}-{value}" for key, value in sorted(params.items()) if key != "platform")
+    return re.sub(r"[^\w.-]", "-", f"{name}__{query}" if query else name) + ".json"
+
+
+class LiveTransport:
+    """Fetches JSON from the menu API, optionally recording every response as a fixture."""
+
+    def __init__(self, base_url=DEFAULT_API_URL, record_dir=None, timeout=30, pool_size=16):
+        self.base_url = base_url.rstrip("/")
+        self.record_dir = Path(record_dir) if record_dir else None
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if self.record_dir:
+            self.record_dir.mkdir(parents=True, exist_ok=True)
+
+    def get_json(self, path, params):
+        response = self.session.get(self.base_url + path, params={"platform": 0, **params}, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if self.record_dir:
+            (self.record_dir / fixture_name(path, params)).write_text(json.dumps(data, indent=2))
+        return data
+
+
+class FixtureTransport:
+    """Replays responses previously recorded by ``LiveTransport``."""
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = Path(fixture_dir)
+
+    def get_json(self, path, params):
+        return json.loads((self.fixture_dir / fixture_name(path, params)).read_text())
+
+
+def nutrient_text(nutrient):
+    """Render an API nutrient the way the nutrition modal shows it."""
+    value = str(nutrient.get("value") or "").strip()
+    unit = (nutrient.get("uom") or "").strip()
+    if re.fullmatch(r"\d[\d,]*(?:\.\d+)?", value) and unit:
+        return f"{value} {unit}"
+    return value
+
+
+def item_record(hall_name, meal_period, table_caption, item):
+    """Build the same ``item_data`` record the Selenium scraper produces."""
+    labels = []
+    for menu_filter in item.get("filters") or []:
+        name = (menu_filter.get("name") or "").lower()
+        for keyword, label in LABEL_KEYWORDS.items():
+            if keyword in name:
+                labels.append(label)
+    nutritional_info = {
+        nutrient["name"]: nutrient_text(nutrient) for nutrient in item.get("nutrients") or [] if nutrient.get("name")
+    }
+    return {
+        'dining_hall': hall_name,
+        'meal_period': meal_period,
+        'title': (item.get("name") or "").strip(),
+        'portion_size': (item.get("portion") or "").strip(),
+        'nutritional_info': normalize_nutrition(nutritional_info),
+        'table_caption': (table_caption or "").strip(),
+        'rating': 0,
+        'rating_count': 0,
+        'labels': normalize_labels(labels),
+        'ingredients': item.get("ingredients"),
+    }
+
+
+def fetch_menu(transport, locations, menu_date, max_workers=8):
+    """Fetch every hall and meal period for ``menu_date`` concurrently.
+
+    ``locations`` maps dining hall names to menu API location ids. Returns a list
+    of ``item_data`` records.
+    """
+    date_param = {"date": menu_date.isoformat()}
+
+    def periods_for(hall):
+        hall_name, location_id = hall
+        data = transport.get_json(f"/location/{location_id}/periods", date_param)
+        return [
+            (hall_name, location_id, period["id"], period["name"])
+            for period in data.get("periods") or []
+            if period.get("name") in VALID_MEAL_PERIODS
+        ]
+
+    def records_for(job):
+        hall_name, location_id, period_id, period_name = job
+        data = transport.get_json(f"/location/{location_id}/periods/{period_id}", date_param)
+        categories = ((data.get("menu") or {}).get("periods") or {}).get("categories") or []
+        records = [
+            item_record(hall_name, period_name, category.get("name"), item)
+            for category in categories
+            for item in category.get("items") or []
+        ]
+        print(f"Fetched {len(records)} items for {period_name} in {hall_name}")
+        return records
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        jobs = [job for jobs in pool.map(periods_for, locations.items()) for job in jobs]
+        return [record for records in pool.map(records_for, jobs) for record in records if record['title']]
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Catalog fields owned by the API, which re-scraping a changed item must not reset
+PRESERVED_FIELDS = ("rating", "rating_count")
+
+# Days of past per-date menus kept in dailyMenus
+KEEP_PAST_DAYS = 7
+
+
+def row_fingerprint(title, portion_size, table_caption, labels):
+    """Fingerprint of the fields visible in a menu row, without opening its nutrition modal."""
+    payload = json.dumps([title, portion_size, table_caption, sorted(set(labels or []))])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def row_slot(dining_hall, meal_period):
+    """Key of the (dining hall, meal period) a row appears in, safe as a Mongo field name."""
+    return hashlib.sha1(json.dumps([dining_hall, meal_period]).encode("utf-8")).hexdigest()[:12]
+
+
+def combined_fingerprint(fingerprints):
+    """One fingerprint over a title's rows in every slot, which the API's search index compares."""
+    return hashlib.sha1(json.dumps(sorted(fingerprints.items())).encode("utf-8")).hexdigest()
+
+
+class MenuStore:
+    """Buffers scraped rows and publishes them to the food catalog and today's menu.
+
+    Existing titles and their row fingerprints are prefetched with one query;
+    new or changed items, today's titles and any per-date menus are kept in
+    memory and written with bulk operations by ``publish``. Safe to share
+    between scraper workers.
+
+    A title can be served in several dining halls and meal periods with a
+    different caption or portion, so fingerprints are kept per (dining hall,
+    meal period) slot in the catalog's ``fingerprints`` map; ``fingerprint`` is
+    their combination.
+    """
+
+    def __init__(self, collection, collectionToday, collectionDailyMenus=None, collectionMenuMeta=None):
+        self.collection = collection
+        self.collectionToday = collectionToday
+        self.collectionDailyMenus = collectionDailyMenus
+        self.collectionMenuMeta = collectionMenuMeta
+        self._lock = threading.Lock()
+        self._fingerprints = {
+            doc["title"]: dict(doc.get("fingerprints") or {})
+            for doc in collection.find({}, {"title": 1, "fingerprints": 1, "_id": 0})
+            if "title" in doc
+        }  # title -> {slot: row fingerprint}
+        self._today = {}  # title -> None, an insertion-ordered set
+        self._days = {}  # date -> {title: menu row}
+        self._new_items = {}  # title -> item
+        self._changed_items = {}  # title -> (fields, {slot: row fingerprint})
+        self._stale_days = set()  # dates whose dailyMenus document todaysFood replaces
+
+    def reset_today(self, menu_date=None):
+        """Forget today's titles and per-date menus collected so far, e.g. before a fallback scrape.
+
+        The API serves a date's dailyMenus document ahead of todaysFood, so a
+        ``menu_date`` document prefetched by an earlier run is deleted once the
+        fallback's todaysFood is published.
+        """
+        with self._lock:
+            self._today = {}
+            self._days = {}
+            if menu_date is not None:
+                self._stale_days.add(menu_date)
+
+    def add_today(self, title):
+        """Record that an item is on today's menu."""
+        with self._lock:
+            self._today[title] = None
+
+    def add_day(self, menu_date, item_data):
+        """Record a full menu row for a date's precomputed menu (first row per title wins)."""
+        row = {k: v for k, v in item_data.items() if k not in PRESERVED_FIELDS}
+        with self._lock:
+            self._days.setdefault(menu_date, {}).setdefault(row['title'], row)
+
+    def needs_details(self, title, fingerprint, dining_hall, meal_period):
+        """Return True if the item is new or its row in this hall and meal period changed since it was last scraped."""
+        with self._lock:
+            return self._fingerprints.get(title, {}).get(row_slot(dining_hall, meal_period)) != fingerprint
+
+    def save(self, item_data, fingerprint):
+        """Queue a new item for the food catalog, or an update for a changed one."""
+        title = item_data['title']
+        slot = row_slot(item_data['dining_hall'], item_data['meal_period'])
+        with self._lock:
+            if title not in self._fingerprints or title in self._new_items:
+                # A new title's first row becomes its catalog entry; later rows only add fingerprints
+                if title not in self._new_items:
+                    self._new_items[title] = item_data
+                    print(f"Queued new item '{title}' with caption '{item_data['table_caption']}'.")
+            elif self._fingerprints[title].get(slot) != fingerprint:
+                fields = {k: v for k, v in item_data.items() if k not in PRESERVED_FIELDS}
+                slots = self._changed_items.get(title, (None, {}))[1]
+                self._changed_items[title] = (fields, {**slots, slot: fingerprint})
+                print(f"Queued update for changed item '{title}'.")
+            self._fingerprints.setdefault(title, {})[slot] = fingerprint
+
+    def publish(self):
+        """Write queued items in bulk, then the per-date menus, then atomically swap in today's menu.
+
+        Each date's menu replaces its dailyMenus document (``_id`` is the ISO date)
+        in one bulk write, and menus older than KEEP_PAST_DAYS are dropped. Writing
+        new or changed items bumps the catalog version, which the API's search
+        index follows. Every item on today's menu gets its ``last_seen``
+        refreshed. Today's titles are written to a staging collection that
+        replaces todaysFood with a single rename, so readers never see a partial
+        menu; only then are dailyMenus documents passed to ``reset_today`` deleted.
+        """
+        with self._lock:
+            new_items = [
+                {**item, 'fingerprints': self._fingerprints[title], 'fingerprint': combined_fingerprint(self._fingerprints[title])}
+                for title, item in self._new_items.items()
+            ]
+            changed_items = [
+                UpdateOne({'title': title}, {'$set': {
+                    **fields,
+                    **{f'fingerprints.{slot}': fingerprint for slot, fingerprint in slots.items()},
+                    'fingerprint': combined_fingerprint(self._fingerprints[title]),
+                }})
+                for title, (fields, slots) in self._changed_items.items()
+            ]
+            self._new_items, self._changed_items = {}, {}
+            today = list(self._today)
+            days, self._days = self._days, {}
+            stale_days = []
+            if today:
+                # Kept until a todaysFood is actually published to replace them
+                stale_days = sorted(menu_date.isoformat() for menu_date in self._stale_days - set(days))
+                self._stale_days = set()
+        now = datetime.now(timezone.utc)
+
+        if new_items:
+            try:
+                self.collection.insert_many([{**item, 'last_seen': now} for item in new_items], ordered=False)
+            except BulkWriteError as e:
+                # Titles inserted concurrently by another run are fine to skip
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+            print(f"Inserted {len(new_items)} new items into the database.")
+
+        if changed_items:
+            self.collection.bulk_write(changed_items, ordered=False)
+            print(f"Updated {len(changed_items)} changed items in the database.")
+
+        if (new_items or changed_items) and self.collectionMenuMeta is not None:
+            self.collectionMenuMeta.update_one(
+                {'_id': 'catalog_version'},
+                {'$inc': {'version': 1}, '$currentDate': {'updated_at': True}},
+                upsert=True,
+            )
+
+        if days and self.collectionDailyMenus is not None:
+            self.collectionDailyMenus.bulk_write([
+                ReplaceOne(
+                    {'_id': menu_date.isoformat()},
+                    {'date': menu_date.isoformat(), 'items': sorted(rows.values(), key=lambda row: row['title']), 'updated_at': now},
+                    upsert=True,
+                )
+                for menu_date, rows in days.items()
+            ])
+            oldest = (min(days) - timedelta(days=KEEP_PAST_DAYS)).isoformat()
+            self.collectionDailyMenus.delete_many({'_id': {'$lt': oldest}})
+            print(f"Published menus for {', '.join(sorted(menu_date.isoformat() for menu_date in days))} to dailyMenus.")
+
+        if not today:
+            print("No menu items scraped; keeping the current todaysFood.")
+            return
+
+        self.collection.update_many({'title': {'$in': today}}, {'$set': {'last_seen': now}})
+
+        staging = self.collectionToday.database[f"{self.collectionToday.name}_staging"]
+        staging.drop()
+        staging.insert_many([{"title": title} for title in today])
+        # The rename replaces todaysFood's indexes, so build the API's title index here
+        staging.create_index("title")
+        staging.rename(self.collectionToday.name, dropTarget=True)
+        print(f"Published {len(today)} items to todaysFood.")
+
+        if stale_days and self.collectionDailyMenus is not None:
+            self.collectionDailyMenus.delete_many({'_id': {'$in': stale_days}})
+            print(f"Dropped the prefetched {', '.join(stale_days)} menu from dailyMenus.")
@@ -0,0 +1,61 @@
+"""Migration: convert JSON-string nutritional_info and labels into typed fields.
+
+Typed amounts are parsed again from their text, so re-running it after a parser
+fix (e.g. thousands separators) corrects documents migrated earlier.
+"""
+from dotenv import load_dotenv
+from pathlib import Path
+from pymongo import MongoClient, UpdateOne
+import os
+
+from nutrition import normalize_nutrition, normalize_labels
+
+
+def migrate(collection, batch_size=500):
+    """Rewrite every food document whose normalized nutrition or labels differ from what it stores."""
+    operations = []
+    migrated = 0
+    for item in collection.find({}, {"nutritional_info": 1, "labels": 1}):
+        fields = {
+            "nutritional_info": normalize_nutrition(item.get("nutritional_info"), reparse=True),
+            "labels": normalize_labels(item.get("labels")),
+        }
+        if all(item.get(field) == value for field, value in fields.items()):
+            continue
+        operations.append(UpdateOne({"_id": item["_id"]}, {"$set": fields}))
+        if len(operations) >= batch_size:
+            migrated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        migrated += collection.bulk_write(operations, ordered=False).modified_count
+    return migrated
+
+
+def migrate_daily_menus(collectionDailyMenus):
+    """Re-parse the nutrition of every row in the precomputed per-date menus."""
+    migrated = 0
+    for menu in collectionDailyMenus.find({}, {"items": 1}):
+        items = [
+            {**row, "nutritional_info": normalize_nutrition(row.get("nutritional_info"), reparse=True)}
+            for row in menu.get("items", [])
+        ]
+        if items != menu.get("items", []):
+            collectionDailyMenus.update_one({"_id": menu["_id"]}, {"$set": {"items": items}})
+            migrated += 1
+    return migrated
+
+
+if __name__ == '__main__':
+    load_dotenv(dotenv_path=Path(__file__).parent.parent / 'secret.env')
+    client = MongoClient(os.getenv("MONGOURI"))
+    collection = client[os.getenv("MONGODB_NAME")][os.getenv("MONGO_COLLECTION_NAME")]
+    count = migrate(collection)
+    menus = migrate_daily_menus(client[os.getenv("MONGODB_NAME")][os.getenv("DAILY_MENUS", "dailyMenus")])
+    # Served menus embed these fields, so make every API instance rebuild its cache
+    client[os.getenv("MONGODB_NAME")][os.getenv("MENU_META", "menuMeta")].update_one(
+        {"_id": "menu_version"},
+        {"$inc": {"version": 1}, "$currentDate": {"updated_at": True}},
+        upsert=True,
+    )
+    print(f"Migrated nutrition fields for {count} food items and {menus} daily menus.")
+    client.close()
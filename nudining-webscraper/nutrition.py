@@ -0,0 +1,66 @@
+import json
+import re
+
+# Matches amounts like "250", "1,050", "12g", "3.5 grams", "less than 1 gram"
+AMOUNT_PATTERN = re.compile(r"^(less than\s+)?(\d[\d,]*(?:\.\d+)?)\s*([a-zA-Z%]*)")
+
+# Spelled-out units and their abbreviations
+UNIT_ALIASES = {
+    "gram": "g",
+    "grams": "g",
+    "milligram": "mg",
+    "milligrams": "mg",
+    "microgram": "mcg",
+    "micrograms": "mcg",
+    "calories": "kcal",
+    "kcal": "kcal",
+}
+
+# Unit hints embedded in nutrient names, e.g. "Protein (g)"
+NAME_UNIT_PATTERN = re.compile(r"\((\w+)\)\s*$")
+
+
+def parse_amount(name, text):
+    """Turn one nutrient line into ``{"value", "unit", "text"}``.
+
+    "less than" amounts are stored as 0, which is how the API has always
+    counted them; the original text is kept for display.
+    """
+    text = text.strip()
+    match = AMOUNT_PATTERN.match(text)
+    if match:
+        less_than, number, unit = match.groups()
+        value = 0.0 if less_than else float(number.replace(",", ""))
+    else:
+        value, unit = 0.0, ""
+    unit = UNIT_ALIASES.get(unit.lower(), unit.lower()) or None
+    if unit is None:
+        name_unit = NAME_UNIT_PATTERN.search(name)
+        if name_unit:
+            unit = name_unit.group(1).lower()
+        elif name.strip().lower() == "calories":
+            unit = "kcal"
+    return {"value": value, "unit": unit, "text": text}
+
+
+def normalize_nutrition(nutritional_info, reparse=False):
+    """Normalize a scraped ``{name: text}`` dict (or its JSON string) into typed amounts.
+
+    Amounts that are already typed are kept, or with ``reparse`` parsed again
+    from their ``text`` (e.g. after a parser fix).
+    """
+    if isinstance(nutritional_info, str):
+        nutritional_info = json.loads(nutritional_info or "{}")
+    return {
+        name.strip(): (
+            parse_amount(name, str(amount["text"])) if reparse and "text" in amount else amount
+        ) if isinstance(amount, dict) else parse_amount(name, str(amount))
+        for name, amount in (nutritional_info or {}).items()
+    }
+
+
+def normalize_labels(labels):
+    """Normalize labels (a list or its JSON string) into a list of unique strings."""
+    if isinstance(labels, str):
+        labels = json.loads(labels or "[]")
+    return list(dict.fromkeys(labels or []))
@@ -0,0 +1,67 @@
+import posixpath
+from urllib.parse import urlparse
+
+from lxml import html
+
+# Label icon file names and the labels they map to
+LABEL_ICONS = {
+    "icon_vegetarian.png": "vegan",
+    "icon_avoiding_gluten.png": "gluten",
+    "icon_protein.png": "protein",
+}
+
+
+def element_text(element):
+    """Whitespace-normalized text of an element, like WebElement.text."""
+    return " ".join(element.text_content().split())
+
+
+def icon_label(src):
+    """The label for an icon's ``src``, matched on its file name (the host varies), or None."""
+    return LABEL_ICONS.get(posixpath.basename(urlparse(src or "").path))
+
+
+def icon_labels(row):
+    """Labels for the icons in a menu row."""
+    return [label for label in map(icon_label, row.xpath(".//img/@src")) if label]
+
+
+def parse_menu_tables(page_source):
+    """Parse every menu table on a meal period page.
+
+    Returns a list of ``{"caption", "rows"}`` dicts, one per table in page order,
+    where each row is ``{"title", "portion_size", "labels", "row_index"}``.
+    ``row_index`` is the row's position among the tbody's rows, so the caller can
+    locate the row's nutrition button in the live page.
+    """
+    tables = []
+    for table in html.fromstring(page_source).xpath("//table[contains(@role, 'table')]"):
+        captions = table.xpath(".//caption")
+        tbodies = table.xpath(".//tbody")
+        rows = []
+        for row_index, row in enumerate(tbodies[0].xpath(".//tr") if tbodies else []):
+            title = row.xpath('.//td[@data-label="Menu item"]//strong')
+            portion = row.xpath('.//td[@data-label="Portion"]//div')
+            if not title or not portion:
+                continue
+            rows.append({
+                "title": element_text(title[0]),
+                "portion_size": element_text(portion[0]),
+                "labels": icon_labels(row),
+                "row_index": row_index,
+            })
+        tables.append({"caption": element_text(captions[0]) if captions else "", "rows": rows})
+    return tables
+
+
+def parse_nutrition_modal(page_source):
+    """Parse the open nutrition modal into ``{nutrient name: amount text}``."""
+    nutritional_info = {}
+    modals = html.fromstring(page_source).xpath("//div[starts-with(@id, 'nutritional-modal')]")
+    uls = modals[0].xpath(".//ul") if modals else []
+    for li in uls[0].xpath(".//li") if uls else []:
+        macro = element_text(li).split(":")
+        if len(macro) < 2:
+            continue
+        nutritional_info[macro[0]] = macro[1]
+    return nutritional_info
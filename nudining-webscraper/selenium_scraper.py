@@ -0,0 +1,402 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import *
+
+from nutrition import normalize_nutrition, normalize_labels
+from menu_store import row_fingerprint
+import page_parser
+
+MENU_URL = 'https://nudining.com/public/whats-on-the-menu'
+
+VALID_DINING_HALLS = ["United Table at International Village", "The Eatery at Stetson East"]
+
+# Define valid meal periods
+VALID_MEAL_PERIODS = ["Breakfast", "Lunch", "Dinner", "Everyday"]
+
+# The nutrition modal (id starts with 'nutritional-modal')
+MODAL_XPATH = "//div[starts-with(@id, 'nutritional-modal')]"
+MODAL_LOCATOR = (By.XPATH, MODAL_XPATH)
+
+# XPath to the n-th row's nutrition button in the t-th menu table (both 1-based),
+# counted the same way page_parser counts rows
+ROW_BUTTON_XPATH = (
+    "((((//table[contains(@role, 'table')])[{table}]//tbody)[1]//tr)[{row}]"
+    "//td[@data-label='Menu item']//button)[1]"
+)
+
+
+def new_driver(headless=True):
+    """Start a Chrome session for one scraper worker."""
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1920,1080")
+    return webdriver.Chrome(options=options)
+
+
+# Function to find a nav link by text
+def find_nav_link_by_text(driver, text):
+    try:
+        return driver.find_element(By.XPATH, f"//a[contains(@class, 'nav-link') and normalize-space(text())='{text}']")
+    except NoSuchElementException:
+        print(f"Nav link with text '{text}' not found.")
+        return None
+
+
+def is_active(element):
+    """True if a dining hall dropdown item or meal period link is the current selection."""
+    return 'active' in (element.get_attribute('class') or '').split()
+
+
+def click_and_wait_for_menu(driver, element, timeout=10, rerender_timeout=5):
+    """Click an element and wait until the menu tables it replaces have re-rendered.
+
+    Only for selections that aren't already active (see ``is_active``); raises
+    TimeoutException if the tables don't re-render within ``rerender_timeout``.
+    """
+    old_tables = driver.find_elements(By.TAG_NAME, 'table')
+    driver.execute_script("arguments[0].scrollIntoView(true);", element)
+    WebDriverWait(driver, timeout).until(EC.element_to_be_clickable(element))
+    element.click()
+    if old_tables:
+        WebDriverWait(driver, rerender_timeout).until(
+            EC.staleness_of(old_tables[0]),
+            f"Menu did not re-render within {rerender_timeout}s of selecting '{element.text.strip()}'",
+        )
+
+
+def open_meal_period(driver, hall_name, mealPeriodName):
+    """Load the menu page and select a dining hall and meal period.
+
+    Returns False if the hall has no such meal period today.
+    """
+    driver.get(MENU_URL)
+
+    # Pick the dining hall, unless the dropdown already shows it
+    button = WebDriverWait(driver, 20).until(
+        EC.element_to_be_clickable((By.CLASS_NAME, 'dropdown-button-content'))
+    )
+    if button.text.strip() != hall_name:
+        button.click()
+        WebDriverWait(driver, 20).until(
+            EC.visibility_of_all_elements_located((By.CLASS_NAME, 'dropdown-item'))
+        )
+        hall = next(
+            (item for item in driver.find_elements(By.CLASS_NAME, "dropdown-item") if item.text.strip() == hall_name),
+            None,
+        )
+        if hall is None:
+            raise NoSuchElementException(f"Dining hall '{hall_name}' not found in the dropdown.")
+        if is_active(hall):
+            hall.click()  # Just closes the dropdown; the menu is already this hall's
+        else:
+            print(f"Selecting dining hall: {hall_name}")
+            click_and_wait_for_menu(driver, hall)
+
+    # Wait for nav-links to be visible, then pick the meal period
+    WebDriverWait(driver, 20).until(
+        EC.visibility_of_all_elements_located((By.CLASS_NAME, 'nav-link'))
+    )
+    link = find_nav_link_by_text(driver, mealPeriodName)
+    if link is None:
+        return False
+    if not is_active(link):
+        print(f"Clicking on meal period: {mealPeriodName}")
+        click_and_wait_for_menu(driver, link)
+
+    # Wait for the tables to load
+    WebDriverWait(driver, 10).until(
+        EC.presence_of_all_elements_located((By.XPATH, "//table[contains(@role, 'table')]"))
+    )
+    return True
+
+
+def scrape_tables(driver, store, hall_name, mealPeriodName):
+    """Scrape the current meal period element by element. Returns the number of rows scraped."""
+    rows_scraped = 0
+    tables = driver.find_elements(By.XPATH, f"//table[contains(@role, 'table')]")
+
+    # Step 4: Iterate over each table
+    for table_index, table in enumerate(tables):
+        try:
+            # Extract the caption from the table
+            caption_element = table.find_element(By.TAG_NAME, 'caption')
+            table_caption = caption_element.text.strip()
+            print(f"Table {table_index + 1} Caption: {table_caption}")
+
+            # Find the tbody inside the table
+            tbody = table.find_element(By.TAG_NAME, 'tbody')
+
+            # Find all tr elements inside tbody
+            rows = tbody.find_elements(By.TAG_NAME, 'tr')
+
+            # Step 5: Iterate over each tr (row)
+            for row_index, row in enumerate(rows):
+                try:
+                    #Used to store allergens
+                    labels = []
+
+                    # Find the two td elements with data-label="Menu item" and data-label="Portion"
+                    menu_item_td = row.find_element(By.XPATH, './/td[@data-label="Menu item"]')
+                    portion_td = row.find_element(By.XPATH, './/td[@data-label="Portion"]')
+
+                    # In menu_item_td, find the nested <strong> element (could be nested)
+                    strong_element = menu_item_td.find_element(By.XPATH, './/strong')
+                    title = strong_element.text.strip()
+                    print(f"Title: {title}")
+
+                    # In menu_item_td, find the nested <button> element (could be nested)
+                    button_element = menu_item_td.find_element(By.XPATH, './/button')
+
+                    # In portion_td, find the <div> element
+                    div_element = portion_td.find_element(By.TAG_NAME, 'div')
+                    portion_size = div_element.text.strip()
+                    print(f"Portion Size: {portion_size}")
+
+                    images = row.find_elements(By.TAG_NAME, 'img')
+                    print(f"Image elements: {images}")
+                    for img_element in images:
+                        src = img_element.get_attribute('src')
+                        print(f"Image src: {src}")
+                        # Matched on the file name like the snapshot parser, so both modes fingerprint rows alike
+                        label = page_parser.icon_label(src)
+                        if label:
+                            labels.append(label)
+                    print(labels)
+
+                    # Record it on today's menu, then skip the modal if the row is unchanged since the last scrape
+                    store.add_today(title)
+                    fingerprint = row_fingerprint(title, portion_size, table_caption, labels)
+                    if not store.needs_details(title, fingerprint, hall_name, mealPeriodName):
+                        print(f"Item '{title}' is unchanged. Skipping nutrition lookup.")
+                        rows_scraped += 1
+                        continue  # Skip to the next item
+
+                    # Click the button to open the nutritional modal
+                    driver.execute_script("arguments[0].scrollIntoView(true);", button_element)  # Scroll to make it visible
+                    WebDriverWait(driver, 10).until(EC.element_to_be_clickable(button_element))
+                    button_element.click()
+                    print("Clicked the Nutritional Info button.")
+
+                    # Wait for the modal to appear (id starts with 'nutritional-modal')
+                    nutritional_modal = WebDriverWait(driver, 10).until(
+                        EC.presence_of_element_located(MODAL_LOCATOR)
+                    )
+
+                    # Wait until the modal's nutrient list has rendered, then find the <ul> element
+                    WebDriverWait(driver, 10).until(lambda d: nutritional_modal.find_elements(By.XPATH, './/ul//li'))
+                    ul_element = nutritional_modal.find_element(By.TAG_NAME, 'ul')
+
+                    # Find all <li> elements inside the <ul>
+                    li_elements = ul_element.find_elements(By.TAG_NAME, 'li')
+
+                    # Initialize a dictionary to store nutritional info
+                    nutritional_info = {}
+
+                    # Iterate over each <li> element
+                    for li in li_elements:
+                        try:
+                            text = li.text.strip()
+                            macro = text.split(":")
+                            macroName = macro[0]
+                            macoAmount = macro[1]
+
+
+                            # Add to nutritional info dictionary
+                            nutritional_info[macroName] = macoAmount
+                            print(f"Extracted - {macroName}: {macoAmount}")
+                        except Exception as e:
+                            print(f"Error parsing li element: {e}")
+                            continue
+
+                    # Close the modal
+                    close_button = nutritional_modal.find_element(By.XPATH, ".//button[contains(@class, 'close')]")
+                    close_button.click()
+                    WebDriverWait(driver, 10).until(EC.invisibility_of_element_located(MODAL_LOCATOR))  # Wait until the modal is closed
+
+                    # Prepare the data to insert into MongoDB
+                    item_data = {
+                        'dining_hall': hall_name,
+                        'meal_period': mealPeriodName,
+                        'title': title,
+                        'portion_size': portion_size,
+                        'nutritional_info': normalize_nutrition(nutritional_info),  # Typed {value, unit, text} amounts
+                        'table_caption': table_caption,
+                        'rating': 0,            # Initialize rating
+                        'rating_count': 0,       # Initialize rating count
+                        'labels': normalize_labels(labels)
+                    }
+
+                    # Queue the new or changed item for MongoDB
+                    store.save(item_data, fingerprint)
+                    rows_scraped += 1
+                    print("-" * 50)
+
+                except Exception as e:
+                    print(f"Error processing row {row_index} in table {table_index}: {e}")
+                    continue  # Move to the next row if there's an error
+
+        except Exception as e:
+            print(f"Error processing table {table_index}: {e}")
+            continue  # Move to the next table if there's an error
+
+    return rows_scraped
+
+
+def scrape_snapshot(driver, store, hall_name, mealPeriodName):
+    """Scrape the current meal period from a single page_source snapshot.
+
+    Rows are parsed locally instead of with per-element WebDriver calls; only
+    opening a nutrition modal still goes through the browser. Returns the number
+    of rows scraped.
+    """
+    rows_scraped = 0
+    for table_index, table in enumerate(page_parser.parse_menu_tables(driver.page_source)):
+        table_caption = table["caption"]
+        print(f"Table {table_index + 1} Caption: {table_caption}")
+
+        for row in table["rows"]:
+            title = row["title"]
+            try:
+                print(f"Title: {title}")
+
+                # Record it on today's menu, then skip the modal if the row is unchanged since the last scrape
+                store.add_today(title)
+                fingerprint = row_fingerprint(title, row["portion_size"], table_caption, row["labels"])
+                if not store.needs_details(title, fingerprint, hall_name, mealPeriodName):
+                    print(f"Item '{title}' is unchanged. Skipping nutrition lookup.")
+                    rows_scraped += 1
+                    continue  # Skip to the next item
+
+                # Click the button to open the nutritional modal
+                button_element = driver.find_element(
+                    By.XPATH, ROW_BUTTON_XPATH.format(table=table_index + 1, row=row["row_index"] + 1)
+                )
+                driver.execute_script("arguments[0].scrollIntoView(true);", button_element)
+                WebDriverWait(driver, 10).until(EC.element_to_be_clickable(button_element))
+                button_element.click()
+
+                # Wait for the modal's nutrient list, then parse it from one snapshot
+                WebDriverWait(driver, 10).until(EC.presence_of_element_located(
+                    (By.XPATH, f"{MODAL_XPATH}//ul//li")
+                ))
+                nutritional_info = page_parser.parse_nutrition_modal(driver.page_source)
+
+                # Close the modal
+                driver.find_element(By.XPATH, f"{MODAL_XPATH}//button[contains(@class, 'close')]").click()
+                WebDriverWait(driver, 10).until(EC.invisibility_of_element_located(MODAL_LOCATOR))
+
+                item_data = {
+                    'dining_hall': hall_name,
+                    'meal_period': mealPeriodName,
+                    'title': title,
+                    'portion_size': row["portion_size"],
+                    'nutritional_info': normalize_nutrition(nutritional_info),
+                    'table_caption': table_caption,
+                    'rating': 0,
+                    'rating_count': 0,
+                    'labels': normalize_labels(row["labels"])
+                }
+                store.save(item_data, fingerprint)
+                rows_scraped += 1
+                print("-" * 50)
+
+            except Exception as e:
+                print(f"Error processing row {row['row_index']} in table {table_index}: {e}")
+                continue  # Move to the next row if there's an error
+    return rows_scraped
+
+
+
+class ScrapeWorkers:
+    """A pool of browser workers, each thread keeping its own Chrome session."""
+
+    def __init__(self, browsers, headless=True):
+        self.browsers = browsers
+        self.headless = headless
+        self._local = threading.local()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def driver(self):
+        if getattr(self._local, "driver", None) is None:
+            self._local.driver = new_driver(self.headless)
+            with self._lock:
+                self._drivers.append(self._local.driver)
+        return self._local.driver
+
+    def discard_driver(self):
+        """Throw away this thread's session, e.g. after it got stuck."""
+        driver = getattr(self._local, "driver", None)
+        if driver is not None:
+            self._local.driver = None
+            with self._lock:
+                self._drivers.remove(driver)
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+
+    def quit(self):
+        for driver in self._drivers:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+
+
+def scrape(store, snapshot=False, browsers=4, headless=True):
+    """Scrape today's menu from nudining.com with a pool of Chrome workers.
+
+    Each (dining hall, meal period) pair is an independent job, so a broken hall
+    only fails its own jobs. Every row is recorded in ``store``; the nutrition
+    modal is only opened for items the store does not know yet. With ``snapshot``,
+    each meal period is parsed from ``driver.page_source`` instead of element by
+    element. Returns a timing report entry per job.
+    """
+    workers = ScrapeWorkers(browsers, headless)
+
+    def run_job(job):
+        hall_name, mealPeriodName = job
+        print(f"Processing {mealPeriodName} in dining hall: {hall_name}")
+        started = time.perf_counter()
+        rows, status = 0, "ok"
+        try:
+            driver = workers.driver()
+            if not open_meal_period(driver, hall_name, mealPeriodName):
+                status = "no menu"
+            elif snapshot:
+                rows = scrape_snapshot(driver, store, hall_name, mealPeriodName)
+            else:
+                rows = scrape_tables(driver, store, hall_name, mealPeriodName)
+        except Exception as e:
+            print(f"Error processing {mealPeriodName} in {hall_name}: {e}")
+            status = f"failed: {type(e).__name__}"
+            workers.discard_driver()
+        return {
+            "dining_hall": hall_name,
+            "meal_period": mealPeriodName,
+            "seconds": time.perf_counter() - started,
+            "rows": rows,
+            "status": status,
+        }
+
+    jobs = [(hall, period) for hall in VALID_DINING_HALLS for period in VALID_MEAL_PERIODS]
+    try:
+        with ThreadPoolExecutor(max_workers=browsers) as pool:
+            report = list(pool.map(run_job, jobs))
+    finally:
+        # Close the browsers
+        workers.quit()
+
+    print("Job timings:")
+    for entry in report:
+        print(f"  {entry['dining_hall']} / {entry['meal_period']}: "
+              f"{entry['seconds']:.1f}s, {entry['rows']} rows, {entry['status']}")
+    return report
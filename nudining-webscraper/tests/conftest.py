@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The scraper modules are run as scripts from nudining-webscraper, not installed
+sys.path.insert(0, str(Path(__file__).parent.parent))
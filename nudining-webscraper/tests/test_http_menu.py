@@ -0,0 +1,91 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+import http_menu
+
+FIXTURES = Path(__file__).parent / "fixtures" / "menu_api"
+
+LOCATIONS = {"The Eatery at Stetson East": "eatery", "United Table at International Village": "iv"}
+
+
+def amount(value, unit, text):
+    return {"value": value, "unit": unit, "text": text}
+
+
+EXPECTED_RECORDS = [
+    {
+        'dining_hall': 'The Eatery at Stetson East',
+        'meal_period': 'Breakfast',
+        'title': 'Oatmeal',
+        'portion_size': '6 oz',
+        'nutritional_info': {
+            'Calories': amount(150.0, 'kcal', '150 kcal'),
+            'Protein (g)': amount(5.0, 'g', '5 g'),
+            'Total Carbohydrates (g)': amount(27.0, 'g', '27 g'),
+            'Total Fat (g)': amount(0.0, 'g', 'less than 1 gram'),
+        },
+        'table_caption': 'Kettles',
+        'rating': 0,
+        'rating_count': 0,
+        'labels': ['vegan'],
+        'ingredients': 'rolled oats, water, salt',
+    },
+    {
+        'dining_hall': 'The Eatery at Stetson East',
+        'meal_period': 'Lunch',
+        'title': 'Double Cheeseburger',
+        'portion_size': '1 each',
+        'nutritional_info': {
+            'Calories': amount(1050.0, 'kcal', '1,050 kcal'),
+            'Protein (g)': amount(58.0, 'g', '58 g'),
+            'Sodium (mg)': amount(1200.0, 'mg', '1,200 mg'),
+        },
+        'table_caption': 'Grill',
+        'rating': 0,
+        'rating_count': 0,
+        'labels': ['protein'],
+        'ingredients': 'beef, cheddar cheese, bun',
+    },
+    {
+        'dining_hall': 'United Table at International Village',
+        'meal_period': 'Everyday',
+        'title': 'Quinoa Salad',
+        'portion_size': '4 oz',
+        'nutritional_info': {
+            'Calories': amount(210.0, 'kcal', '210 kcal'),
+            'Protein (g)': amount(6.5, 'g', '6.5 g'),
+        },
+        'table_caption': 'Salad Bar',
+        'rating': 0,
+        'rating_count': 0,
+        'labels': ['vegan', 'gluten'],
+        'ingredients': None,
+    },
+]
+
+
+def test_fixture_replay_builds_item_data_records():
+    records = http_menu.fetch_menu(http_menu.FixtureTransport(FIXTURES), LOCATIONS, date(2026, 10, 19))
+    assert records == EXPECTED_RECORDS
+
+
+def test_fixture_names_match_recorded_files():
+    name = http_menu.fixture_name("/location/eatery/periods/eatery-lunch", {"platform": 0, "date": "2026-10-19"})
+    assert (FIXTURES / name).is_file()
+
+
+def test_missing_fixture_fails_the_fetch():
+    with pytest.raises(FileNotFoundError):
+        http_menu.fetch_menu(http_menu.FixtureTransport(FIXTURES), LOCATIONS, date(2026, 10, 20))
+
+
+@pytest.mark.parametrize("nutrient, text", [
+    ({"value": "1,050", "uom": "kcal"}, "1,050 kcal"),
+    ({"value": "6.5", "uom": "g"}, "6.5 g"),
+    ({"value": "less than 1 gram", "uom": "g"}, "less than 1 gram"),
+    ({"value": None, "uom": "g"}, ""),
+])
+def test_nutrient_text(nutrient, text):
+    assert http_menu.nutrient_text(nutrient) == text
@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import pytest
+from lxml import html
+
+import page_parser
+from menu_store import row_fingerprint
+from nutrition import normalize_nutrition
+from selenium_scraper import ROW_BUTTON_XPATH
+
+PAGES = Path(__file__).parent / "fixtures" / "pages"
+
+
+def page(name):
+    return (PAGES / name).read_text()
+
+
+def test_parse_menu_tables():
+    assert page_parser.parse_menu_tables(page("stetson_lunch.html")) == [
+        {"caption": "Grill", "rows": [
+            {"title": "Double Cheeseburger", "portion_size": "1 each", "labels": ["protein"], "row_index": 0},
+            {"title": "Black Bean Burger", "portion_size": "1 each", "labels": ["vegan", "gluten"], "row_index": 1},
+        ]},
+        {"caption": "Soups", "rows": [
+            {"title": "Tomato Basil Soup", "portion_size": "8 oz", "labels": ["vegan"], "row_index": 1},
+        ]},
+    ]
+
+
+def test_row_index_locates_the_rows_button():
+    tree = html.fromstring(page("stetson_lunch.html"))
+    for table_index, table in enumerate(page_parser.parse_menu_tables(page("stetson_lunch.html"))):
+        for row in table["rows"]:
+            button = tree.xpath(ROW_BUTTON_XPATH.format(table=table_index + 1, row=row["row_index"] + 1))
+            strong = button[0].xpath("ancestor::td[1]//strong")
+            assert page_parser.element_text(strong[0]) == row["title"]
+
+
+@pytest.mark.parametrize("src, label", [
+    ("https://www.nudining.com/img/icon_vegetarian.png", "vegan"),
+    ("https://nudining.com/img/icon_vegetarian.png", "vegan"),
+    ("/img/icon_avoiding_gluten.png?v=2", "gluten"),
+    ("https://nudining.com/img/icon_protein.png", "protein"),
+    ("https://nudining.com/img/icon_spicy.png", None),
+    (None, None),
+])
+def test_icon_label_ignores_the_host(src, label):
+    assert page_parser.icon_label(src) == label
+
+
+def test_hosts_give_the_same_fingerprint():
+    # The element and snapshot modes must fingerprint a row alike, or switching modes reopens every modal
+    labels = [page_parser.icon_label(src) for src in (
+        "https://www.nudining.com/img/icon_vegetarian.png", "https://nudining.com/img/icon_vegetarian.png"
+    )]
+    assert row_fingerprint("Soup", "8 oz", "Soups", labels[:1]) == row_fingerprint("Soup", "8 oz", "Soups", labels[1:])
+
+
+def test_parse_nutrition_modal():
+    nutritional_info = page_parser.parse_nutrition_modal(page("nutrition_modal.html"))
+    assert normalize_nutrition(nutritional_info) == {
+        "Calories": {"value": 1050.0, "unit": "kcal", "text": "1,050"},
+        "Protein (g)": {"value": 58.0, "unit": "g", "text": "58g"},
+        "Total Fat (g)": {"value": 0.0, "unit": "g", "text": "less than 1 gram"},
+    }
+
+
+def test_parse_nutrition_modal_without_a_modal():
+    assert page_parser.parse_nutrition_modal(page("stetson_lunch.html")) == {}